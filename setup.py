@@ -32,7 +32,6 @@ setup(
     install_requires=[
         'pprintpp',
         'pysyte',
-        'pyyaml',
         'requests',
     ],
     scripts=['bin/whyp'],
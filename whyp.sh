@@ -18,6 +18,8 @@ export WHYP_SOURCE=$(readlink -f $BASH_SOURCE)
 export WHYP_DIR=$(dirname $WHYP_SOURCE)
 export WHYP_EDITOR=
 export WHYP_PY=$WHYP_DIR/whyp
+export WHYP_SOCKET=${WHYP_SOCKET:-${XDG_RUNTIME_DIR:-/tmp}/whyp-$UID/daemon.sock}
+export WHYP_SESSION_DIR=${XDG_RUNTIME_DIR:-/tmp}/whyp-$UID/sessions/$$
 
 # x
 
@@ -134,10 +136,13 @@ whyp () {
     local name_="$1" verbose_=
     shift
     if [[ $name_ == -v ]]; then verbose_=1; shift; fi
-    if is_alias $name_; then
+    local seen_=" "
+    while is_alias $name_ && [[ $seen_ != *" $name_ "* ]]; do
         alias $name_
-        whyp $(dealias $name_)
-    elif is_function "$name_"; then
+        seen_="$seen_$name_ "
+        name_=${BASH_ALIASES[$name_]%%[[:space:]]*}
+    done
+    if is_function "$name_"; then
         qype "$name_" | grep -v ' is a '
         parse_function_ "$name_"
         echo
@@ -163,6 +168,10 @@ whyp () {
 # xxxxx
 
 ww_py () {
+    if [[ $WHYP_DAEMON ]] && whyp_daemon_ready_; then
+        whyp_daemon_query whyp "$@"
+        return $?
+    fi
     whyp_bin_run whyp "$@"
 }
 
@@ -170,17 +179,19 @@ ww_py () {
 
 ww_help () {
     local command_=$1; shift
-    rm -f /tmp/out /tmp/err
-    [[ $command_ =~ (-w|--ww) ]] && ww $function_ 2>/tmp/err
+    whyp_session_ || return 1
+    local out_=$WHYP_SESSION_DIR/out err_=$WHYP_SESSION_DIR/err
+    rm -f $out_ $err_
+    [[ $command_ =~ (-w|--ww) ]] && ww $function_ 2>$err_
     if [[ $command_ =~ (-h|--help) ]]; then
         if is_builtin $command_; then help $comand_
         elif is_file  $command_; then $command_ --help
         elif is_function $command_; then ww $command_
         elif is_alias $command_; then ww $command_
         fi
-    fi >/tmp/out 2>/tmp/err
+    fi >$out_ 2>$err_
     local result_=$?
-    [[ -f /tmp/err ]] && return 1
+    [[ -f $err_ ]] && return 1
     return $result_
 }
 
@@ -248,6 +259,7 @@ whyp_source () {
     if [[ -f "$1" ]]; then
         # Note - DO NOT change the "$@" back to "$1" here - source CAN pass on args
         quietly source "$@"
+        remember_source_ "$1"
         return 0
     fi
     whyp_optional $2 || echo 'Cannot source "'"$2"'". It is not a file.' >&2
@@ -283,6 +295,60 @@ whyp_bin_run () {
     fi
 }
 
+whyp_daemon_start () {
+    local __doc__="""Start a whyp daemon, unless one is running"""
+    [[ -S $WHYP_SOCKET ]] && return 0
+    (PYTHONPATH=$WHYP_DIR nohup python3 -m whyp --daemon "$@" >/dev/null 2>&1 &)
+}
+
+whyp_daemon_ready_ () {
+    [[ -S $WHYP_SOCKET ]] || return 1
+    type -P socat >/dev/null || type -P nc >/dev/null
+}
+
+whyp_daemon_connect_ () {
+    if type -P socat >/dev/null; then
+        # socat waits -t seconds for the answer after sending the query
+        socat -t 600 - UNIX-CONNECT:$WHYP_SOCKET
+    else
+        nc -U $WHYP_SOCKET
+    fi
+}
+
+whyp_daemon_query () {
+    local __doc__="""Ask the whyp daemon to run a program (whyp or python) with args
+
+    The daemon runs it in this shell's directory, with this shell's PATH
+    Names for --batch - are read here, as the daemon cannot read this stdin
+    """
+    local arg_= last_= args_=()
+    for arg_ in "$@"; do
+        if [[ $arg_ == - && $last_ =~ ^(-b|--batch)$ ]] || [[ $arg_ =~ ^(-b|--batch=)-$ ]]; then
+            whyp_session_ || return 1
+            cat > "$WHYP_SESSION_DIR/batch"
+            arg_=${arg_%-}$WHYP_SESSION_DIR/batch
+        fi
+        args_+=("$arg_")
+        last_=$arg_
+    done
+    local IFS=$'\t'
+    printf "%s\n" "$$"$'\t'"$PWD"$'\t'"$PATH"$'\t'"${args_[*]}" | whyp_daemon_connect_ | {
+        local status_=
+        read -r status_ || return 2
+        cat
+        return $status_
+    }
+}
+
+whyp_python_run () {
+    local __doc__="""Run whyp-python, in the daemon if one is running"""
+    if [[ $WHYP_DAEMON ]] && whyp_daemon_ready_; then
+        whyp_daemon_query python "$@"
+        return $?
+    fi
+    whyp_bin_run whyp-python "$@"
+}
+
 whyp_pudb_run () {
     local __doc__="""Debug a script in whyp/bin"""
     local script_=$(ww_bin $1); shift
@@ -337,13 +403,13 @@ looks_like_python_name () {
 }
 
 python_will_import () {
-    local __doc__="""test that python will import any args"""
-    local python_=${PYTHON:-python}
-    for arg in "$@"; do
-        looks_like_python_name $arg || continue
-        QUIETLY $python_ -c "import $arg" || return 1
+    local __doc__="""test that python will import all args"""
+    local arg_= names_=()
+    for arg_ in "$@"; do
+        looks_like_python_name $arg_ && names_+=($arg_)
     done
-    return 0
+    [[ $names_ ]] || return 0
+    QUIETLY whyp_python_run --import --python ${PYTHON:-python} "${names_[@]}"
 }
 
 which_python_executable () {
@@ -361,13 +427,13 @@ which_python_executable () {
     fi
     local which_python_=$(qich $python_name_)
     [[ -x "$which_python_" ]] || which_python_=$(quietly PATH=/usr/local/bin:/usr/bin/:/bin which $python_name_)
-    [[ -x "$which_python_" ]] && "$which_python_" -c "import sys; sys.stdout.write(sys.executable)"
+    [[ -x "$which_python_" ]] && whyp_python_run --executable --python "$which_python_"
 }
 
 python_executable () {
     local __doc__="""Executable used by python"""
     if [[ -x "$1" ]]; then
-        "$1" -c "import sys; sys.stdout.write(sys.executable)"
+        whyp_python_run --executable --python "$1"
     else
         which_python_executable "$@"
     fi
@@ -375,26 +441,22 @@ python_executable () {
 
 python_module () {
     local __doc__="""the files that python imports args as"""
-    local result_=1
-    local python_=${PYTHON:-python}
-    for arg in "$@"; do
-        looks_like_python_name $arg || continue
-        quietly $python_ -c "import $arg; print($arg.__file__)" || continue
-        result_=0
+    local arg_= names_=()
+    for arg_ in "$@"; do
+        looks_like_python_name $arg_ && names_+=($arg_)
     done
-    return $result_
+    [[ $names_ ]] || return 1
+    quietly whyp_python_run --import --python ${PYTHON:-python} "${names_[@]}"
 }
 
 python_module_version () {
-    local __doc__="""the installed version of that python package"""
-    local result_=1 arg_=
-    local python_=${PYTHON:-python}
+    local __doc__="""the installed version of those python packages"""
+    local arg_= names_=()
     for arg_ in "$@"; do
-        python_will_import $arg_ || continue
-        quietly $python_ -c "import $arg_; module=$arg_; print(f'{module.__file__}: {module.__version__}')"  || continue
-        result_=0
+        looks_like_python_name $arg_ && names_+=($arg_)
     done
-    return $result_
+    [[ $names_ ]] || return 1
+    quietly whyp_python_run --import --version --python ${PYTHON:-python} "${names_[@]}"
 }
 
 make_shebang () {
@@ -483,23 +545,114 @@ whyp_show_ () {
 }
 
 ww_show () {
-    local ww_= name_= result_=1
-    for name_ in "$@"; do
-        for ww_ in ww_bash ww_alias ww_function ww_file ; do
-            quietly $ww_ $name_ l || continue
-            result_=0
-        done
-    done
+    local __doc__="""Show each thing those names could be, as found by one call to python"""
+    local name_= kind_= path_= result_=1
+    # Dump here, as what whyp_dump_ remembers would be lost in a subshell
+    ww_dumped_ || return 1
+    while IFS=$'\t' read -r name_ kind_ path_; do
+        case $kind_ in
+            keyword|builtin) quietly help "$name_" ;;
+            alias) quietly ww_alias "$name_" l ;;
+            function) quietly ww_function "$name_" l ;;
+            file) quietly ww_file "$name_" l ;;
+            *) continue ;;
+        esac && result_=0
+    done < <(ww_py_dumps_ --types "$@")
     return $result_
 }
 
 ww_command () {
     local __doc__="""find what will be executed for a command string"""
-    PATH_TO_ALIASES=/tmp/aliases
-    PATH_TO_FUNCTIONS=/tmp/functions
-    alias > $PATH_TO_ALIASES
-    declare -f > $PATH_TO_FUNCTIONS
-    ww_py --aliases=$PATH_TO_ALIASES --functions=$PATH_TO_FUNCTIONS "$@";
+    ww_dumped_ || return 1
+    ww_py_dumps_ "$@"
+}
+
+ww_dumped_ () {
+    local __doc__="""Make sure this shell's session has fresh dumps, run this in the current shell"""
+    whyp_session_ || return 1
+    PATH_TO_ALIASES=$WHYP_SESSION_DIR/aliases
+    PATH_TO_FUNCTIONS=$WHYP_SESSION_DIR/functions
+    PATH_TO_HASHED=$WHYP_SESSION_DIR/hashed
+    whyp_dump_
+}
+
+ww_py_dumps_ () {
+    local __doc__="""Run python on the dumps made by ww_dumped_"""
+    ww_py --aliases=$PATH_TO_ALIASES --functions=$PATH_TO_FUNCTIONS --hashed=$PATH_TO_HASHED "$@";
+}
+
+whyp_dump_ () {
+    local __doc__="""Dump aliases, functions and hashed commands, if they changed since the last dump
+
+    Changes are noticed from a cksum of the aliases and functions, however they
+        were defined (at the prompt, by source, or by whyp_source)
+    Summing is much cheaper than writing the dumps, which python would re-read
+    Each dump gets a .hash file from cksum, so python can keep what it parsed
+    """
+    local state_=$({ alias; declare -f; } | cksum)
+    if [[ $state_ != "$WHYP_DUMPED" || ! -f $PATH_TO_ALIASES.hash || ! -f $PATH_TO_FUNCTIONS.hash ]]; then
+        alias | whyp_write_ $PATH_TO_ALIASES
+        declare -f | whyp_write_ $PATH_TO_FUNCTIONS
+        WHYP_DUMPED=$state_
+    fi
+    local hashed_=$(hash -l 2>/dev/null | cksum)
+    [[ $hashed_ == "$WHYP_HASHED" && -f $PATH_TO_HASHED ]] && return 0
+    hash -l 2>/dev/null | whyp_write_ $PATH_TO_HASHED
+    WHYP_HASHED=$hashed_
+}
+
+whyp_write_ () {
+    local __doc__="""Replace that file (and its .hash) with stdin, so readers never see half a file"""
+    local temp_="$1.$BASHPID.tmp"
+    cat > "$temp_"
+    cksum < "$temp_" > "$temp_.hash"
+    mv -f "$temp_" "$1"
+    mv -f "$temp_.hash" "$1.hash"
+}
+
+whyp_session_ () {
+    local __doc__="""Make sure this shell's session directory exists, and is private
+
+    The runtime directory may be in a shared /tmp, so each directory down to
+        the session must be owned by this user, with no access for others
+    Directories are checked once for each shell, as long as the session is there
+    """
+    [[ -d $WHYP_SESSION_DIR && $WHYP_SESSION_CHECKED == "$WHYP_SESSION_DIR" ]] && return 0
+    (umask 077; mkdir -p "$WHYP_SESSION_DIR") || return 1
+    local runtime_dir_=${WHYP_SESSION_DIR%/sessions/*} dir_= mode_=
+    for dir_ in "$runtime_dir_" "$runtime_dir_/sessions" "$WHYP_SESSION_DIR"; do
+        [[ -d $dir_ ]] || continue
+        mode_=$(ls -ld "$dir_")
+        if [[ -L $dir_ || ! -O $dir_ || $mode_ != drwx------* ]]; then
+            echo "whyp: $dir_ is not private to this user" >&2
+            return 1
+        fi
+    done
+    WHYP_SESSION_CHECKED=$WHYP_SESSION_DIR
+}
+
+whyp_collect_sessions_ () {
+    local __doc__="""Remove session directories of shells which have gone"""
+    local session_dir_
+    [[ -O ${WHYP_SESSION_DIR%/*} && ! -L ${WHYP_SESSION_DIR%/*} ]] || return 0
+    for session_dir_ in "${WHYP_SESSION_DIR%/*}"/*; do
+        [[ -d $session_dir_ ]] || continue
+        kill -0 "${session_dir_##*/}" 2>/dev/null && continue
+        rm -rf "$session_dir_"
+    done
+}
+
+ww_complete_ () {
+    local __doc__="""Complete the name of a command for whyp, from the last dumps"""
+    local word_="${COMP_WORDS[COMP_CWORD]}"
+    COMPREPLY=($(ww_py --aliases=${PATH_TO_ALIASES:-$WHYP_SESSION_DIR/aliases} --functions=${PATH_TO_FUNCTIONS:-$WHYP_SESSION_DIR/functions} --complete "$word_" 2>/dev/null))
+}
+
+complete -F ww_complete_ whyp w ww ww_command
+
+ww_batch () {
+    local __doc__="""Describe names read from a file (or stdin) as json lines"""
+    ww_command --batch "${1:--}"
 }
 
 ww_debug () {
@@ -513,16 +666,12 @@ ww_debug () {
 
 edit_alias_ () {
     local __doc__="""Edit an alias in the file $ALIASES, if that file exists"""
-    sources_ --any || return
-    local whyp_sources_=$(sources_ --all --optional)
-    for sourced_file in $whyp_sources_; do
-        [[ -f $sourced_file ]] || continue
-        line_number=$(grep -nF "alias $1=" $sourced_file | cut -d ':' -f1)
-        if [[ -n "$line_number" ]]; then
-            whyp_edit_file $sourced_file +$line_number
-            return 0
-        fi
-    done
+    local sourced_file= line_number=
+    IFS=: read -r sourced_file line_number _ < <(sources_ --locate "$1" --kind alias)
+    if [[ -f "$sourced_file" ]]; then
+        whyp_edit_file "$sourced_file" +$line_number
+        return 0
+    fi
     echo "Did not find a file with '$1'" >&2
     return 1
 }
@@ -640,6 +789,15 @@ sources_ () {
     whyp_bin_run sources "$@"
 }
 
+remember_source_ () {
+    local __doc__="""Append that file to the log of sourced files (see whyp/sources.py)"""
+    local path_="$1"
+    [[ $path_ == /* ]] || path_="$PWD/$path_"
+    echo "$path_" >> "${WHYP_SOURCES:-$WHYP_PY/sources.log}" 2>/dev/null
+    # Only python compacts the log, so ask it to, about once in 64 appends
+    (( RANDOM % 64 )) || ( sources_ --compact >/dev/null 2>&1 & )
+}
+
 write_new_file_ () {
     local __doc__="""Copy the head of this script to file"""
     head -n $eading_lines_ $BASH_SOURCE > "$path_to_file"
@@ -701,7 +859,8 @@ is_file () {
 }
 
 is_hash () {
-    is_types "$1" hash
+    local __doc__="""Whether $1 is in bash's hash table"""
+    [[ $1 && ${BASH_CMDS[$1]+hashed} ]]
 }
 
 is_types () {
@@ -718,12 +877,12 @@ is_types () {
 
 is_alias () {
     local __doc__="""Whether $1 is an alias"""
-    has_type "$1" alias
+    [[ $1 && ${BASH_ALIASES[$1]+alias} ]]
 }
 
 is_function () {
     local __doc__="""Whether $1 is a function"""
-    has_type "$1" function
+    declare -F -- "$1" >/dev/null
 }
 
 is_keyword () {
@@ -745,3 +904,6 @@ is_python_module () {
     python_will_import "$@"
 }
 
+
+# Shells which have gone leave their session directories behind
+whyp_collect_sessions_
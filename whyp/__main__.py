@@ -10,16 +10,20 @@ It assumes aliases and functions have been written to files before starting
 
 
 import sys
+import json
 import argparse
+from itertools import chain
 
 from whyp import why
+from whyp import session
 from whyp import arguments
+from whyp import coprocess
 
-def parse_args():
+def parse_args(args=None):
     """Look for options from user on the command line for this script"""
     parser = arguments.parser(__doc__)
     pa = parser.add_argument
-    pa('commands', nargs='+', help='the commands to be typed')
+    pa('commands', nargs='*', help='the commands to be typed')
     pa('-e', '--hide_errors', action='store_true',
                       help='hide error messages from successful commands')
     pa('-l', '--ls', action='store_true',
@@ -30,19 +34,166 @@ def parse_args():
                       help='do not show any output')
     pa('-v', '--verbose', action='store_true',
                       help='whether to show more info, such as file contents')
-    pa('-A', '--aliases', default='/tmp/aliases',
+    pa('-n', '--lines', type=int,
+                      help='show at most that many lines of source')
+    pa('-j', '--jobs', type=int, default=1,
+                      help='show up to that many commands at once')
+    pa('--pager', action='store_true',
+                      help='show source with vimcat or less, not in colour')
+    pa('-A', '--aliases', default=session.path_to('aliases'),
                       help='path to file which holds aliases')
-    pa('-F', '--functions', default='/tmp/functions',
+    pa('-F', '--functions', default=session.path_to('functions'),
                       help='path to file which holds functions')
-    return arguments.parse_args()
+    pa('-H', '--hashed', default=session.path_to('hashed'),
+                      help='path to file which holds commands hashed by bash')
+    pa('--types', action='store_true',
+                      help='show what each command could be, like "type -at"')
+    pa('-b', '--batch',
+                      help='read names from that file ("-" for stdin), '
+                           'and write a json line for each')
+    pa('--shadows', action='store_true',
+                      help='show commands which hide others of the same name')
+    pa('--complete', metavar='PREFIX',
+                      help='list known names which start with that prefix')
+    pa('--one-shot', action='store_true',
+                      help='run each shell command in a new bash')
+    pa('--daemon', action='store_true',
+                      help='keep running, answering queries on a socket')
+    pa('--idle', type=float, default=600,
+                      help='seconds a daemon waits for a query before stopping')
+    parsed = arguments.parse_args(args)
+    wanted = parsed.commands, parsed.daemon, parsed.batch, parsed.shadows
+    if not any(wanted) and parsed.complete is None:
+        parser.error('the following arguments are required: commands')
+    return parsed
 
 
-def main():
+def read_names(stream):
+    """Names from that stream, one per line"""
+    for line in stream:
+        name = line.strip()
+        if name:
+            yield name
+
+
+def batch(names):
+    """Write a json line describing each of those names"""
+    result = False
+    for name in names:
+        resolved = why.resolve(name)
+        print(json.dumps(resolved), flush=True)
+        result |= bool(resolved['kind'])
+    return result
+
+
+def show_shadows(names):
+    """Show each command which hides others, and those it hides"""
+    for name, used, shadowed in why.shadows(names):
+        print('%s: %s' % (name, used))
+        for definition in shadowed:
+            print('    %s' % definition)
+    return True
+
+
+def show_types(names):
+    """Show each kind of each of those names, one per line
+
+    Lines are "name<TAB>kind<TAB>path", where path is only given for files
+    """
+    result = False
+    for name in names:
+        for kind in why.kinds(name):
+            path_to_command = why.command_path(name) if kind == 'file' else ''
+            print('%s\t%s\t%s' % (name, kind, path_to_command))
+            result = True
+    return result
+
+
+def show_completions(prefix):
+    """Show known names which start with that prefix, one per line"""
+    from whyp import complete
+    names = complete.complete(prefix)
+    if names:
+        print('\n'.join(names))
+    return bool(names)
+
+
+def show_suggestions(name):
+    """Tell the user about known names which look like that name"""
+    from whyp import complete
+    names = complete.suggestions(name)
+    if names:
+        print('%s not found, did you mean: %s' % (name, ', '.join(names)),
+              file=sys.stderr)
+
+
+def show_commands(commands, jobs):
+    """Show each of those commands, giving whether each was shown
+
+    With more than one job, commands are shown at once, in threads
+        but their output still appears in the order of the commands
+    """
+    if jobs < 2:
+        for command in commands:
+            yield why.show_command(command)
+        return
+    from whyp import jobs as jobs_
+    for shown, output, errors in jobs_.in_order(
+            why.show_command, commands, jobs):
+        jobs_.write_bytes(sys.stdout, output)
+        jobs_.write_bytes(sys.stderr, errors)
+        yield shown
+
+
+def trust_dumps():
+    """Ignore any dump which another user could have written"""
+    for option in ('aliases', 'functions', 'hashed'):
+        path_to_dump = arguments.get(option)
+        if not session.is_trusted(path_to_dump):
+            print('Not reading %s: its directory is not private' % (
+                path_to_dump), file=sys.stderr)
+            arguments.put(option, None)
+
+
+def main(args=None):
     """Run the program"""
-    parse_args()
+    parse_args(args)
+    trust_dumps()
+    if arguments.get('daemon'):
+        from whyp import daemon
+        return daemon.serve(arguments.get('idle'))
+    if arguments.get('complete') is not None:
+        return show_completions(arguments.get('complete'))
+    if arguments.get('types'):
+        return show_types(arguments.get('commands'))
+    if arguments.get('shadows'):
+        return show_shadows(arguments.get('commands'))
+    path_to_names = arguments.get('batch')
+    if path_to_names:
+        commands = arguments.get('commands')
+        if path_to_names == '-':
+            return batch(chain(commands, read_names(sys.stdin)))
+        with open(path_to_names) as stream:
+            return batch(chain(commands, read_names(stream)))
+    commands = arguments.get('commands')
+    jobs = min(arguments.get('jobs') or 1, len(commands))
+    # The coprocess is one bash, which cannot run commands for many threads
+    coprocess.enabled = not arguments.get('one_shot') and jobs < 2
+    # The daemon runs many queries in one process, so reset an earlier limit
+    if arguments.get('lines'):
+        from whyp import highlight
+        highlight.lines = arguments.get('lines')
+    elif 'whyp.highlight' in sys.modules:
+        sys.modules['whyp.highlight'].lines = None
     result = 0
-    for command in arguments.get('commands'):
-        result |= why.show_command(command)
+    try:
+        for command, shown in zip(commands, show_commands(commands, jobs)):
+            quiet = arguments.get('quiet') or arguments.get('file')
+            if not shown and not quiet:
+                show_suggestions(command)
+            result |= shown
+    finally:
+        coprocess.close()
     return result
 
 
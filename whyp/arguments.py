@@ -10,9 +10,10 @@ def parser(doc):
     return _parser
 
 
-def parse_args():
+def parse_args(args=None):
+    """Parse those args, or sys.argv if none are given"""
     global _args
-    _args = _parser.parse_args()
+    _args = _parser.parse_args(args)
     return _args
 
 def get(name):
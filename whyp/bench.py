@@ -0,0 +1,1017 @@
+"""Benchmarks for whyp's hot paths
+
+Run all benchmarks with
+    $ python -m whyp.bench
+or some of them with
+    $ python -m whyp.bench path_resolution
+
+Benchmarks make their own fixtures, such as dumps of 10k aliases and 5k
+    functions, PATHs of synthetic executables, and a fake site-packages
+Results can be written as json, kept as a baseline with --save,
+    and compared with that baseline by a later run with --baseline
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import tracemalloc
+import subprocess
+import contextlib
+from contextlib import contextmanager
+
+
+def timed(method, *args, **kwargs):
+    """Seconds taken to call that method with those args"""
+    start = time.perf_counter()
+    method(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def best_of(repeats, method, *args, **kwargs):
+    """The fastest of several timings of that method"""
+    return min(timed(method, *args, **kwargs) for _ in range(repeats))
+
+
+def run_python(code):
+    """Run that code in a new python, with whyp importable"""
+    environ = dict(os.environ)
+    whyp_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    environ['PYTHONPATH'] = os.pathsep.join(
+        [whyp_dir, environ.get('PYTHONPATH', '')])
+    subprocess.run([sys.executable, '-c', code], env=environ, check=True)
+
+
+def bench_path_resolution(repeats=5, name='ls'):
+    """Cold-start latency of resolving one name, probing vs full table"""
+    code = ';'.join([
+        'from whyp import shell',
+        'shell.lazy = %s',
+        'shell.which(%r)',
+    ])
+    return {
+        'probe': best_of(repeats, run_python, code % (True, name)),
+        'table': best_of(repeats, run_python, code % (False, name)),
+    }
+
+
+@contextmanager
+def environment(**values):
+    """Set those values in os.environ, restoring old values afterwards"""
+    saved = {k: os.environ.get(k) for k in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                del os.environ[key]
+            else:
+                os.environ[key] = value
+
+
+def bench_path_index(repeats=5):
+    """Reading all of PATH, without and with a cached index"""
+    from whyp import cache
+    from whyp import shell
+
+    def cold():
+        cache.clear('path')
+        shell.path_index()
+
+    with tempfile.TemporaryDirectory(prefix='whyp-bench-') as temp:
+        with environment(XDG_CACHE_HOME=temp):
+            result = {'cold': best_of(repeats, cold)}
+            shell.path_index()
+            result['warm'] = best_of(repeats, shell.path_index)
+    return result
+
+
+def synthetic_path(root, dirs=50, files=2000):
+    """Make a PATH of that many directories, each with that many executables
+
+    The directories are made in root, and are removed with it
+    About one name in ten is repeated in every directory
+    """
+    path_dirs = []
+    for d in range(dirs):
+        path_dir = os.path.join(root, 'bin%02d' % d)
+        os.mkdir(path_dir)
+        for f in range(files):
+            name = 'common%04d' % f if f % 10 else 'dir%02d_%04d' % (d, f)
+            path_to_file = os.path.join(path_dir, name)
+            with open(path_to_file, 'w') as stream:
+                stream.write('#! /bin/sh\n')
+            os.chmod(path_to_file, 0o755)
+        path_dirs.append(path_dir)
+    return ':'.join(path_dirs)
+
+
+@contextmanager
+def temporary_path(dirs=50, files=2000):
+    """A synthetic_path() in a temporary directory, removed afterwards"""
+    with tempfile.TemporaryDirectory(prefix='whyp-path-') as root:
+        yield synthetic_path(root, dirs, files)
+
+
+@contextmanager
+def slow_directories(path_dirs, delay, read=None):
+    """Make reading those directories take longer, like a network mount"""
+    from whyp import shell
+    saved = shell.directory_commands
+    fast = read or saved
+
+    def slow(path_dir):
+        if path_dir in path_dirs:
+            time.sleep(delay)
+        return fast(path_dir)
+
+    shell.directory_commands = slow
+    try:
+        yield
+    finally:
+        shell.directory_commands = saved
+
+
+def pysyte_commands(path_dir):
+    """directory_commands() as it was, using pysyte paths"""
+    from pysyte.types.paths import path
+    return [_.name for _ in path(path_dir).list_files() if _.isexec()]
+
+
+def bench_path_scan(repeats=3, dirs=50, files=2000, slow=5, delay=0.05):
+    """Scanning a synthetic PATH, where some directories are slow"""
+    from whyp import cache
+    from whyp import shell
+    result = {}
+    cache.enabled = False
+    try:
+        with temporary_path(dirs, files) as path_:
+            slow_dirs = path_.split(':')[:slow]
+            with environment(PATH=path_):
+                with slow_directories(slow_dirs, delay, pysyte_commands):
+                    result['pysyte'] = best_of(
+                        repeats, shell.path_commands, 1)
+                with slow_directories(slow_dirs, delay):
+                    result['scandir'] = best_of(
+                        repeats, shell.path_commands, 1)
+                    result['threads'] = best_of(
+                        repeats, shell.path_commands, 8)
+    finally:
+        cache.enabled = True
+    return result
+
+
+def function_dump(path_to_file, count=5000):
+    """Write a "declare -f" dump of that many functions to that file"""
+    with open(path_to_file, 'w') as stream:
+        for i in range(count):
+            stream.write(
+                'function_%04d () \n{ \n'
+                '    local __doc__="""Function number %d""";\n'
+                '    if [[ -n "$1" ]]; then\n'
+                '        echo "$1" | sed -e "s,a,b," > /dev/null;\n'
+                '    fi;\n'
+                '    function_%04d "$@"\n'
+                '}\n' % (i, i, (i + 1) % count))
+
+
+def eager_functions(path_to_file):
+    """get_functions() as it was, reading and formatting every function"""
+    with open(path_to_file) as stream:
+        lines = [l.rstrip() for l in stream]
+    name = function_lines = None
+    functions = {}
+    for line in lines:
+        if line == '{':
+            continue
+        elif line == '}':
+            if function_lines:
+                functions[name] = function_lines[:]
+        else:
+            words = line.split()
+            if not words:
+                continue
+            if len(words) == 2 and words[1] == '()':
+                name = words[0]
+                function_lines = []
+                continue
+            function_lines.append(line)
+    result = {}
+    for name, lines in functions.items():
+        result[name] = '%s ()\n{\n%s\n}\n' % (name, '\n'.join(lines))
+    return result
+
+
+def peak_memory(method, *args):
+    """Most bytes allocated by python while calling that method"""
+    tracemalloc.start()
+    try:
+        method(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_functions(repeats=5, count=5000):
+    """Parsing a large "declare -f" dump, eagerly vs index only"""
+    from whyp import why
+    from whyp import arguments
+    name = 'function_%04d' % (count // 2)
+    with tempfile.TemporaryDirectory(prefix='whyp-bench-') as temp:
+        path_to_dump = os.path.join(temp, 'functions')
+        function_dump(path_to_dump, count)
+        arguments.put('functions', path_to_dump)
+
+        def indexed():
+            why.get_function_index.clear()
+            return why.function_source(name)
+
+        def eager():
+            return eager_functions(path_to_dump)[name]
+
+        return {
+            'eager': best_of(repeats, eager),
+            'indexed': best_of(repeats, indexed),
+            'eager_bytes': peak_memory(eager),
+            'indexed_bytes': peak_memory(indexed),
+        }
+
+
+def bench_daemon(queries=50):
+    """Queries per second, from a daemon vs starting python for each"""
+    import threading
+    from whyp import daemon
+    temp = tempfile.mkdtemp()
+    path_to_socket = os.path.join(temp, 'daemon.sock')
+    args = ['--aliases=%s' % os.path.join(temp, 'aliases'),
+            '--functions=%s' % os.path.join(temp, 'functions'),
+            'ls']
+    code = ';'.join([
+        'import os, sys',
+        'sys.stdout = open(os.devnull, "w")',
+        'from whyp import __main__',
+        '__main__.main(%r)' % args,
+    ])
+    try:
+        forked = timed(lambda: [run_python(code) for _ in range(queries)])
+        server = daemon.bind(path_to_socket)
+        thread = threading.Thread(
+            target=server.serve_until_idle, args=(0.5,))
+        thread.start()
+        try:
+            served = timed(lambda: [
+                daemon.query('whyp', args, path=path_to_socket)
+                for _ in range(queries)])
+        finally:
+            thread.join()
+            server.server_close()
+    finally:
+        shutil.rmtree(temp)
+    return {'fork_qps': queries / forked, 'daemon_qps': queries / served}
+
+
+def popular_modules(count=200):
+    """Names of that many modules which are available to import
+
+    Installed distributions come first, then the standard library
+        leaving out modules which do things on import
+    """
+    from whyp import python
+    rude = {'antigravity', 'this', 'idlelib', 'turtledemo', 'tkinter',
+            'turtle', 'pydoc_data', 'lib2to3', 'ensurepip', 'venv'}
+    installed = sorted(python.module_distributions())
+    standard = sorted(getattr(sys, 'stdlib_module_names', []))
+    names = []
+    for name in installed + standard:
+        if name.startswith('_') or name in rude or name in names:
+            continue
+        names.append(name)
+    return names[:count]
+
+
+def bench_python_locate(count=200):
+    """Finding popular modules from their specs vs by importing them"""
+    names = popular_modules(count)
+    code = ';'.join([
+        'from whyp import arguments',
+        'from whyp import python',
+        'python.parse_args(%r)',
+        'python.script()',
+    ])
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull):
+            located = timed(run_python, code % (['-q'] + names,))
+            imported = timed(run_python, code % (['-q', '-i'] + names,))
+    return {'located': located, 'imported': imported, 'modules': len(names)}
+
+
+def listing_path_to_python(path, name):
+    """path_to_python() as it was, listing the directory for each name"""
+    import fnmatch
+    result = os.path.join(path, name)
+    if os.path.isdir(result):
+        return result
+    try:
+        listed = os.listdir(path)
+    except OSError:
+        return None
+    glob = '%s.py*' % name
+    python_files = [
+        f for f in listed
+        if os.path.isfile(os.path.join(path, f)) and fnmatch.fnmatch(f, glob)]
+    return python_files and os.path.join(path, python_files[0]) or None
+
+
+def bench_sys_path_index(count=200):
+    """Finding modules in every directory of sys.path, listing vs indexed"""
+    from whyp import python
+    names = popular_modules(count)
+    directories = [_ or os.getcwd() for _ in sys.path]
+
+    def listing():
+        return [listing_path_to_python(d, n) for n in names for d in directories]
+
+    def indexed():
+        python._indexes.clear()
+        return [python.path_to_python(d, n) for n in names for d in directories]
+
+    return {'listing': timed(listing), 'indexed': timed(indexed)}
+
+
+def bench_workers(count=20):
+    """Locating modules in two pythons, a process per module vs workers"""
+    from whyp import workers
+    names = popular_modules(count)
+    temp = tempfile.mkdtemp()
+    executables = [sys.executable, os.path.join(temp, 'python')]
+
+    def processes():
+        for executable in executables:
+            for name in names:
+                subprocess.run(
+                    [executable, '-c', 'import importlib.util as u; '
+                     'print(u.find_spec(%r))' % name],
+                    stdout=subprocess.DEVNULL)
+
+    def pooled():
+        pool = workers.Pool()
+        for executable in executables:
+            for name in names:
+                pool.ask(executable, 'locate', name)
+        pool.close()
+
+    try:
+        os.symlink(sys.executable, executables[1])
+        return {'processes': timed(processes), 'workers': timed(pooled)}
+    finally:
+        shutil.rmtree(temp)
+
+
+def bench_coprocess(commands=50, count=1000):
+    """Running commands which need functions, one-shot bash vs coprocess"""
+    from whyp import why
+    from whyp import coprocess
+    path_to_dump = os.path.join(tempfile.mkdtemp(), 'functions')
+    command = 'declare -f function_0001 | wc -l'
+
+    def one_shot():
+        for _ in range(commands):
+            why.run_one_shot(command, path_to_dump)
+
+    def coprocessed():
+        for _ in range(commands):
+            why.run_in_bash(command, path_to_dump)
+        coprocess.close()
+
+    try:
+        function_dump(path_to_dump, count)
+        return {'one_shot': timed(one_shot), 'coprocess': timed(coprocessed)}
+    finally:
+        shutil.rmtree(os.path.dirname(path_to_dump))
+
+
+def first_byte_and_total(method, *args):
+    """Seconds until that method first writes to sys.stdout, and in all
+
+    sys.stdout is a pipe, read by another thread
+    """
+    import threading
+    read_fd, write_fd = os.pipe()
+    times = []
+
+    def read():
+        first = True
+        while True:
+            chunk = os.read(read_fd, 1 << 16)
+            if first:
+                times.append(time.perf_counter())
+                first = False
+            if not chunk:
+                break
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    saved = sys.stdout
+    start = time.perf_counter()
+    sys.stdout = open(write_fd, 'w')
+    try:
+        method(*args)
+    finally:
+        sys.stdout.close()
+        sys.stdout = saved
+    reader.join()
+    os.close(read_fd)
+    return times[0] - start, time.perf_counter() - start
+
+
+def bench_streaming(megabytes=50):
+    """Showing a large script, buffered vs streamed"""
+    from whyp import why
+    from whyp import arguments
+    arguments.put('hide_errors', False)
+    path_to_script = os.path.join(tempfile.mkdtemp(), 'big.sh')
+    line = 'echo "%s"\n' % ('x' * 70)
+    command = 'cat %s' % path_to_script
+    try:
+        with open(path_to_script, 'w') as stream:
+            stream.write('#! /usr/bin/env bash\n')
+            stream.write(line * (megabytes * (1 << 20) // len(line)))
+        buffered = first_byte_and_total(
+            why.show_output_of_shell_command, command, None, False)
+        streamed = first_byte_and_total(
+            why.show_output_of_shell_command, command, None, True)
+    finally:
+        shutil.rmtree(os.path.dirname(path_to_script))
+    return {
+        'buffered_first_byte': buffered[0],
+        'buffered_total': buffered[1],
+        'streamed_first_byte': streamed[0],
+        'streamed_total': streamed[1],
+    }
+
+
+def bench_highlight(repeats=5, lines=2000):
+    """Showing a script, with the built-in viewer vs a pager"""
+    from whyp import why
+    from whyp import highlight
+    path_to_script = os.path.join(tempfile.mkdtemp(), 'script.py')
+    command = '%s %s' % (why.pager(), path_to_script)
+    try:
+        with open(path_to_script, 'w') as stream:
+            stream.write('#! /usr/bin/env python3\n')
+            stream.write('print("fred", 1)  # comment\n' * lines)
+        with open(os.devnull, 'w') as devnull:
+            with contextlib.redirect_stdout(devnull):
+                first = timed(highlight.view_file, path_to_script)
+                again = best_of(repeats, highlight.view_file, path_to_script)
+                highlight.lines = 50
+                try:
+                    cached = best_of(
+                        repeats, highlight.view_file, path_to_script)
+                finally:
+                    highlight.lines = None
+        piped = best_of(
+            repeats, subprocess.run, command, shell=True,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    finally:
+        shutil.rmtree(os.path.dirname(path_to_script))
+    return {
+        'pager': piped,
+        'builtin_first': first,
+        'builtin_again': again,
+        'builtin_cached_50_lines': cached,
+    }
+
+
+def yaml_sources(paths_to_files, path_to_yaml):
+    """Remember files as sources used to: rewriting all of them each time"""
+    import yaml
+    remembered = set()
+    for path_to_file in paths_to_files:
+        remembered.add(path_to_file)
+        real_sources = sorted(_ for _ in remembered if os.path.isfile(_))
+        with open(path_to_yaml, 'w') as stream:
+            yaml.safe_dump(real_sources, stream)
+
+
+def bench_sources(count=500):
+    """Remembering many sourced files, appending to a log vs rewriting yaml"""
+    from whyp import sources
+    temp_dir = tempfile.mkdtemp()
+    paths_to_files = [
+        os.path.join(temp_dir, 'source_%04d.sh' % i) for i in range(count)]
+
+    def logged():
+        sources._sources = None
+        for path_to_file in paths_to_files:
+            sources.source(path_to_file)
+
+    def loaded():
+        sources._sources = None
+        return sources.load(False)
+
+    path_to_log = os.path.join(temp_dir, 'sources.log')
+    result = {}
+    try:
+        for i, path_to_file in enumerate(paths_to_files):
+            with open(path_to_file, 'w') as stream:
+                stream.write('alias a%d=ls\n' % i)
+        with environment(WHYP_SOURCES=path_to_log):
+            result['log'] = timed(logged)
+            result['log_load'] = timed(loaded)
+        try:
+            result['yaml'] = timed(
+                yaml_sources, paths_to_files,
+                os.path.join(temp_dir, 'sources.yaml'))
+        except ImportError:
+            pass
+    finally:
+        sources._sources = None
+        shutil.rmtree(temp_dir)
+    return result
+
+
+def alias_dump(path_to_dump, count, depth=5):
+    """Write count aliases, in chains of that depth, ending at ls"""
+    with open(path_to_dump, 'w') as stream:
+        for i in range(count):
+            target = 'ls' if i % depth == 0 else 'alias_%05d' % (i - 1)
+            stream.write("alias alias_%05d='%s -%d'\n" % (i, target, i))
+        stream.write("alias ls='ls --color'\n")
+
+
+def walked_aliases(name):
+    """Expand aliases as whyp used to, one alias at a time for each name"""
+    from whyp import why
+    chain = []
+    while why.is_alias(name) and name not in chain:
+        chain.append(name)
+        name = why.alias_command(why.get_alias(name))
+    return chain, name
+
+
+def bench_alias_chains(count=10000):
+    """Expanding every alias, walking each chain vs all chains in one pass"""
+    from whyp import why
+    from whyp import arguments
+    path_to_dump = os.path.join(tempfile.mkdtemp(), 'aliases')
+    names = []
+
+    def chained():
+        why.get_alias_chains.clear()
+        return [why.expand_aliases(_) for _ in names]
+
+    try:
+        alias_dump(path_to_dump, count)
+        arguments.put('aliases', path_to_dump)
+        names.extend(why.get_aliases())
+        return {
+            'walked': timed(lambda: [walked_aliases(_) for _ in names]),
+            'chained': timed(chained),
+        }
+    finally:
+        shutil.rmtree(os.path.dirname(path_to_dump))
+
+
+def bench_shadows(dirs=25, files=2000):
+    """Finding every shadowed command in a PATH of 50k executables"""
+    from whyp import why
+    from whyp import shell
+    from whyp import arguments
+    root = tempfile.mkdtemp(prefix='whyp-bench-')
+    path_to_aliases = os.path.join(root, 'aliases')
+    path_to_functions = os.path.join(root, 'functions')
+    try:
+        path_ = synthetic_path(root, dirs, files)
+        alias_dump(path_to_aliases, 1000)
+        function_dump(path_to_functions, 1000)
+        arguments.put('aliases', path_to_aliases)
+        arguments.put('functions', path_to_functions)
+        with environment(PATH=path_, XDG_CACHE_HOME=root):
+            cold = timed(why.shadows)
+            result = {
+                'cold': cold,
+                'warm': timed(why.shadows),
+                'locations': timed(shell.path_locations),
+                'shadowed': len(why.shadows()),
+            }
+    finally:
+        shutil.rmtree(root)
+    return result
+
+
+def bench_complete(dirs=25, files=2000, repeats=5):
+    """Completing and suggesting names, from a PATH of 50k executables"""
+    from whyp import complete
+    from whyp import arguments
+    root = tempfile.mkdtemp(prefix='whyp-bench-')
+    arguments.put('aliases', None)
+    arguments.put('functions', None)
+    try:
+        path_ = synthetic_path(root, dirs, files)
+        with environment(PATH=path_, XDG_CACHE_HOME=root):
+            result = {
+                'rebuild': timed(complete.collect_names),
+                'first': timed(complete.complete, 'common01'),
+                'complete': best_of(repeats, complete.complete, 'common01'),
+                'first_suggestion': timed(complete.suggestions, 'comon0100'),
+                'suggestion': best_of(
+                    repeats, complete.suggestions, 'comon0100'),
+            }
+    finally:
+        shutil.rmtree(root)
+    return result
+
+
+def hash_dump(path_to_dump):
+    """Write a hash beside that dump, as the shell does"""
+    with open(path_to_dump) as stdin:
+        with open('%s.hash' % path_to_dump, 'w') as stdout:
+            subprocess.run(['cksum'], stdin=stdin, stdout=stdout, check=True)
+
+
+def bench_snapshots(aliases=10000, functions=5000):
+    """Reading unchanged dumps in a new run, parsing vs restoring by hash"""
+    from whyp import why
+    from whyp import arguments
+    root = tempfile.mkdtemp()
+    path_to_aliases = os.path.join(root, 'aliases')
+    path_to_functions = os.path.join(root, 'functions')
+
+    def new_run():
+        why.clear_caches()
+        why.get_aliases()
+        why.get_function_index()
+
+    try:
+        alias_dump(path_to_aliases, aliases)
+        function_dump(path_to_functions, functions)
+        arguments.put('aliases', path_to_aliases)
+        arguments.put('functions', path_to_functions)
+        with environment(XDG_CACHE_HOME=root):
+            result = {'parsed': timed(new_run)}
+            hash_dump(path_to_aliases)
+            hash_dump(path_to_functions)
+            new_run()
+            result['restored'] = timed(new_run)
+    finally:
+        shutil.rmtree(root)
+    return result
+
+
+def read_first_lines(paths_to_files):
+    """Guess languages as whyp used to: reading each whole file as text"""
+    for path_to_file in paths_to_files:
+        try:
+            first_line = open(path_to_file).readlines()[0]
+        except (IndexError, IOError, UnicodeDecodeError):
+            continue
+        if first_line.startswith('#!'):
+            first_line[2:].strip().split('/')[-1]
+
+
+def bench_languages():
+    """Classifying every executable in PATH, reading whole files vs prefixes"""
+    from whyp import shell
+    from whyp import languages
+    paths_to_files = [
+        os.path.join(path_dir, name) for path_dir, names in shell.path_index()
+        for name in names]
+
+    def classified():
+        return [languages.language(_) for _ in paths_to_files]
+
+    languages.clear()
+    result = {
+        'files': len(paths_to_files),
+        'whole_files': timed(read_first_lines, paths_to_files),
+        'prefixes': timed(classified),
+        'cached': timed(classified),
+    }
+    languages.clear()
+    return result
+
+
+def bench_types(count=200, checks=4):
+    """Classifying names, "type -t" subshells for each vs one python call
+
+    ww_show used to make that many checks of each name, each in a subshell
+    """
+    from whyp import why
+    from whyp import shell
+    commands = sorted(shell.all_path_commands())[:count - 20]
+    names = sorted(why.bash_builtins)[:10] + commands
+    names += sorted(why.bash_keywords)[:10]
+    check = 'type_=$(type -t "$name_")'
+    script = 'for name_ in "$@"; do %s; done' % '; '.join([check] * checks)
+    subshells = timed(
+        subprocess.run, ['bash', '-c', script, 'bash'] + names, check=True)
+    code = ';'.join([
+        'import os, sys',
+        'sys.stdout = open(os.devnull, "w")',
+        'from whyp import __main__',
+        '__main__.main(%r)' % (['--types'] + names),
+    ])
+    return {
+        'names': len(names),
+        'subshells': subshells,
+        'python': timed(run_python, code),
+        'in_process': timed(lambda: [why.kinds(_) for _ in names]),
+    }
+
+
+@contextmanager
+def slow_stat(delay):
+    """Make each check of an executable take longer, like a network mount"""
+    from whyp import shell
+    saved = shell.is_executable_file
+
+    def slow(string):
+        time.sleep(delay)
+        return saved(string)
+
+    shell.is_executable_file = slow
+    try:
+        yield
+    finally:
+        shell.is_executable_file = saved
+
+
+def bench_jobs(names=40, dirs=10, delay=0.002, workers=(1, 2, 4, 8, 16)):
+    """Showing many names from a slow PATH, with more and more jobs"""
+    from whyp import __main__
+    last_dir = 'dir%02d' % (dirs - 1)
+    commands = ['%s_%04d' % (last_dir, _ * 10) for _ in range(names)]
+    result = {}
+
+    def show(jobs):
+        with contextlib.redirect_stdout(open(os.devnull, 'w')) as stream:
+            __main__.main(['--jobs', str(jobs)] + commands)
+        stream.close()
+
+    with temporary_path(dirs, names * 10) as path_:
+        with environment(PATH=path_):
+            with slow_stat(delay):
+                for jobs in workers:
+                    result['jobs_%d' % jobs] = timed(show, jobs)
+    return result
+
+
+def site_packages(root, count=500):
+    """Make a fake site-packages in root, with count modules and packages
+
+    Half are modules, half are packages with a distribution and a version
+    """
+    os.makedirs(root, exist_ok=True)
+    names = []
+    for i in range(count):
+        if i % 2:
+            name = 'fake_module_%04d' % i
+            with open(os.path.join(root, '%s.py' % name), 'w') as stream:
+                stream.write('"""Fake module %d"""\n' % i)
+        else:
+            name = 'fake_package_%04d' % i
+            os.mkdir(os.path.join(root, name))
+            path_to_init = os.path.join(root, name, '__init__.py')
+            with open(path_to_init, 'w') as stream:
+                stream.write('__version__ = "1.%d"\n' % i)
+            info = os.path.join(root, '%s-1.%d.dist-info' % (name, i))
+            os.mkdir(info)
+            with open(os.path.join(info, 'METADATA'), 'w') as stream:
+                stream.write('Metadata-Version: 2.1\nName: %s\n'
+                             'Version: 1.%d\n' % (name, i))
+            with open(os.path.join(info, 'top_level.txt'), 'w') as stream:
+                stream.write('%s\n' % name)
+        names.append(name)
+    return names
+
+
+def sourced_files(root, count=100, aliases=20):
+    """Make count files of aliases and functions, for whyp_source"""
+    os.makedirs(root, exist_ok=True)
+    paths_to_files = []
+    for i in range(count):
+        path_to_file = os.path.join(root, 'source_%04d.sh' % i)
+        with open(path_to_file, 'w') as stream:
+            for j in range(aliases):
+                stream.write("alias s%d_%d='ls -%d'\n" % (i, j, j))
+            stream.write('source_%d () \n{ \n    echo %d\n}\n' % (i, i))
+        paths_to_files.append(path_to_file)
+    return paths_to_files
+
+
+@contextmanager
+def put_arguments(**values):
+    """Put those values in whyp's arguments, restoring old values afterwards"""
+    from whyp import arguments
+    saved = {k: arguments.get(k) for k in values}
+    for key, value in values.items():
+        arguments.put(key, value)
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            arguments.put(key, value)
+
+
+@contextmanager
+def fixtures(aliases=10000, functions=5000, dirs=20, files=500,
+             modules=500, sources=100):
+    """Make a realistic shell for whyp, in a temporary directory
+
+    Gives a dictionary of the fixtures' paths and names
+    While in use, whyp reads those dumps, that PATH, that site-packages,
+        that log of sourced files, and a cache of its own
+    """
+    import importlib
+    from whyp import sources as sources_
+    root = tempfile.mkdtemp(prefix='whyp-bench-')
+    made = {
+        'root': root,
+        'aliases': os.path.join(root, 'aliases'),
+        'functions': os.path.join(root, 'functions'),
+        'site_packages': os.path.join(root, 'site-packages'),
+        'log': os.path.join(root, 'sources.log'),
+    }
+    try:
+        alias_dump(made['aliases'], aliases)
+        function_dump(made['functions'], functions)
+        made['path'] = synthetic_path(root, dirs, files)
+        made['modules'] = site_packages(made['site_packages'], modules)
+        made['sources'] = sourced_files(
+            os.path.join(root, 'sources'), sources)
+        with open(made['log'], 'w') as stream:
+            stream.write(''.join('%s\n' % _ for _ in made['sources']))
+        sys.path.insert(0, made['site_packages'])
+        importlib.invalidate_caches()
+        values = dict(
+            PATH=made['path'], WHYP_SOURCES=made['log'],
+            XDG_CACHE_HOME=os.path.join(root, 'cache'))
+        with environment(**values):
+            with put_arguments(
+                    aliases=made['aliases'], functions=made['functions'],
+                    hashed=None, quiet=False, verbose=False, file=False,
+                    ls=False, lines=None, pager=False):
+                yield made
+    finally:
+        if made['site_packages'] in sys.path:
+            sys.path.remove(made['site_packages'])
+        sources_._sources = None
+        shutil.rmtree(root)
+
+
+def bench_hot_paths(repeats=3):
+    """The main hot paths of whyp, on fixtures of a large shell"""
+    from whyp import why
+    from whyp import cache
+    from whyp import shell
+    from whyp import python
+    from whyp import sources
+
+    def aliases():
+        why.get_aliases.clear()
+        return why.get_aliases()
+
+    def functions():
+        why.clear_caches()
+        return why.get_functions()
+
+    def import_paths(names):
+        python._indexes.clear()
+        return [python.path_to_import(_) for _ in names]
+
+    def loaded():
+        sources._sources = None
+        return sources.load(False)
+
+    with fixtures() as made:
+        names = list(why.get_aliases())[::100]
+        names += list(why.get_function_index())[::50]
+        names += ['common0001', 'dir00_0000']
+
+        def shown():
+            with open(os.devnull, 'w') as devnull:
+                with contextlib.redirect_stdout(devnull):
+                    return [why.show_command(_) for _ in names]
+
+        cache.enabled = False
+        try:
+            result = {
+                'path_commands': best_of(repeats, shell.path_commands),
+                'get_aliases': best_of(repeats, aliases),
+                'get_functions': best_of(repeats, functions),
+                'show_command': best_of(repeats, shown),
+                'path_to_import': best_of(
+                    repeats, import_paths, made['modules']),
+                'sources_load': best_of(repeats, loaded),
+            }
+        finally:
+            cache.enabled = True
+            why.clear_caches()
+    return result
+
+
+def benchmarks():
+    """All methods in this module whose names start with 'bench_'"""
+    module = sys.modules[__name__]
+    return {
+        name[len('bench_'):]: getattr(module, name)
+        for name in dir(module) if name.startswith('bench_')
+    }
+
+
+def run(names=None):
+    """Results of those benchmarks (or all), as {name: {key: value}}"""
+    known = benchmarks()
+    return {name: known[name]() for name in names or sorted(known)}
+
+
+def default_baseline():
+    """Where results are kept for later runs to compare with"""
+    from whyp import cache
+    return os.path.join(cache.directory(), 'bench.json')
+
+
+def is_timing(key, value):
+    """Whether that value is a number of seconds
+
+    Other floats are rates, named "..._qps", and ints are counts or bytes
+    """
+    return isinstance(value, float) and not key.endswith('_qps')
+
+
+def compare(baseline, results, tolerance=0.5, noise=0.001):
+    """Results which are worse than the baseline by more than tolerance
+
+    Gives a list of (name, key, old value, new value)
+    Timings are worse if slower, rates if slower, counts never are
+    Timings which differ by less than noise seconds are not compared
+    """
+    worse = []
+    for name, values in sorted(results.items()):
+        for key, new in sorted(values.items()):
+            old = baseline.get(name, {}).get(key)
+            if not isinstance(old, float) or not isinstance(new, float):
+                continue
+            if is_timing(key, new):
+                if new - old > noise and new > old * (1 + tolerance):
+                    worse.append((name, key, old, new))
+            elif new * (1 + tolerance) < old:
+                worse.append((name, key, old, new))
+    return worse
+
+
+def show_results(results):
+    """Show each result on a line of its own, as name.key: value"""
+    for name, values in sorted(results.items()):
+        for key, value in values.items():
+            format_ = '%s.%s: %.6f' if isinstance(value, float) else '%s.%s: %s'
+            print(format_ % (name, key, value))
+
+
+def parse_args(args=None):
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    pa = parser.add_argument
+    pa('names', nargs='*', help='benchmarks to run (default: all)')
+    pa('--json', action='store_true', help='write results as json')
+    pa('--save', nargs='?', const=default_baseline(), metavar='PATH',
+       help='keep results as a baseline (default: in whyp\'s cache)')
+    pa('--baseline', nargs='?', const=default_baseline(), metavar='PATH',
+       help='compare results with a baseline, failing on regressions')
+    pa('--tolerance', type=float, default=0.5,
+       help='how much worse than the baseline is a regression (0.5 = 50%%)')
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    import json
+    options = parse_args(args)
+    unknown = set(options.names) - set(benchmarks())
+    if unknown:
+        print('Unknown benchmarks: %s' % ', '.join(sorted(unknown)),
+              file=sys.stderr)
+        return False
+    results = run(options.names)
+    if options.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        show_results(results)
+    if options.save:
+        from whyp import cache
+        cache.replace_file(options.save, json.dumps(results, indent=2))
+    if not options.baseline:
+        return True
+    with open(options.baseline) as stream:
+        baseline = json.load(stream)
+    worse = compare(baseline, results, options.tolerance)
+    for name, key, old, new in worse:
+        print('Regression in %s.%s: %.6f -> %.6f' % (name, key, old, new),
+              file=sys.stderr)
+    return not worse
+
+
+if __name__ == '__main__':
+    sys.exit(os.EX_OK if main() else 1)
@@ -0,0 +1,192 @@
+"""Keep data between runs of whyp
+
+Data is stored as json files in a whyp directory under $XDG_CACHE_HOME
+    (or ~/.cache if that is not set)
+Each file records the version of its layout, and data from an older version
+    (or a corrupt file) is treated as if it was never saved
+"""
+
+import os
+import json
+import stat
+import time
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# volatile to importers
+enabled = True
+
+# Timestamps are taken to be this fine, unless they are in whole seconds
+fine_tick_ns = 10 ** 7
+
+
+def directory():
+    """The directory which holds whyp's cache files"""
+    root = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(root, 'whyp')
+
+
+def path_to(name):
+    """Path to the cache file for that name"""
+    return os.path.join(directory(), '%s.json' % name)
+
+
+def tick_ns(mtime_ns):
+    """How coarse timestamps like that mtime could be, in nanoseconds
+
+    An mtime in whole seconds suggests a coarse filesystem (FAT's is 2s)
+
+    >>> tick_ns(10 ** 18), tick_ns(10 ** 18 + 1)
+    (2000000000, 10000000)
+    """
+    return fine_tick_ns if mtime_ns % 10 ** 9 else 2 * 10 ** 9
+
+
+def signature(path):
+    """Values which change when the item at that path changes
+
+    For directories the mtime changes when entries are added or removed
+        Gives None if there is no such path
+    Signatures are taken when the item is read, and the last value says
+        whether the item is racy then, i.e. it changed within the same tick
+        of its timestamps, so could change again without changing its mtime
+    A racy item settles once it is signed (and read) again after that tick
+
+    >>> assert signature('/') and not signature('/not/a/real/path')
+    """
+    try:
+        status = os.stat(path)
+    except (OSError, TypeError, ValueError):
+        return None
+    mtime = status.st_mtime_ns
+    racy = mtime + tick_ns(mtime) > time.time_ns()
+    return [mtime, status.st_ino, status.st_size,
+            status.st_ctime_ns, racy]
+
+
+def is_racy(signature_):
+    """Whether an item with that signature had only just changed when read"""
+    return bool(signature_) and bool(signature_[-1])
+
+
+def unchanged(old, new):
+    """Whether an item signed old, and now signed new, is known unchanged
+
+    An item which was racy when signed is never known to be unchanged
+        so it is read again, and once read after its tick it has settled
+
+    >>> unchanged([1, 2, 3, 4, False], [1, 2, 3, 4, False])
+    True
+    >>> unchanged([1, 2, 3, 4, True], [1, 2, 3, 4, True])
+    False
+    """
+    return old == new and not is_racy(old)
+
+
+def load(name, version):
+    """The data saved under that name, or None
+
+    Gives None if caching is not enabled, or the file is missing, corrupt,
+        or was saved by a different version
+    """
+    if not enabled:
+        return None
+    try:
+        with open(path_to(name)) as stream:
+            stored = json.load(stream)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(stored, dict) or stored.get('version') != version:
+        return None
+    return stored.get('data')
+
+
+def valid(item, **fields):
+    """Whether that item is a dict with each of those fields, of those types
+
+    Data loaded from a cache file may have any shape, so entries are checked
+        and a bad entry is treated as if it was never saved
+
+    >>> valid({'signature': [1], 'names': []}, signature=list, names=list)
+    True
+    >>> valid({'signature': 5}, signature=list), valid(5, signature=list)
+    (False, False)
+    """
+    return isinstance(item, dict) and all(
+        isinstance(item.get(k), type_) for k, type_ in fields.items())
+
+
+def replace_file(path_to_file, text):
+    """Replace the contents of that file with that text
+
+    The text is written to a temporary file first, then renamed
+        so that concurrent readers (or writers) never see a partial file
+    An existing file keeps its mode, a new one is private to the user
+    """
+    temp = None
+    try:
+        parent = os.path.dirname(path_to_file) or '.'
+        os.makedirs(parent, exist_ok=True)
+        fd, temp = tempfile.mkstemp(
+            dir=parent, prefix='.%s.' % os.path.basename(path_to_file))
+        with os.fdopen(fd, 'w') as stream:
+            stream.write(text)
+        try:
+            mode = stat.S_IMODE(os.stat(path_to_file).st_mode)
+        except FileNotFoundError:
+            mode = None
+        if mode is not None:
+            os.chmod(temp, mode)
+        os.replace(temp, path_to_file)
+    except OSError:
+        if temp and os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+
+@contextmanager
+def locked(path_to_file):
+    """Hold an exclusive lock for changing that file, while in the context
+
+    The lock is taken on a separate ".lock" file, which is never replaced
+        so it still holds while that file is replaced (see replace_file())
+    Without fcntl (i.e. not on Unix) nothing is locked
+    """
+    if not fcntl:
+        yield
+        return
+    with open('%s.lock' % path_to_file, 'a') as stream:
+        fcntl.flock(stream, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(stream, fcntl.LOCK_UN)
+
+
+def save(name, version, data):
+    """Save that data under that name
+
+    Readers never see a partially written file, see replace_file()
+    """
+    if not enabled:
+        return False
+    try:
+        text = json.dumps({'version': version, 'data': data})
+        replace_file(path_to(name), text)
+    except (OSError, TypeError, ValueError):
+        return False
+    return True
+
+
+def clear(name):
+    """Forget anything saved under that name"""
+    try:
+        os.remove(path_to(name))
+    except FileNotFoundError:
+        pass
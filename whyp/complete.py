@@ -0,0 +1,124 @@
+"""Find known names which start with, or look like, a given name
+
+Known names are aliases, functions, executables in PATH, and environment
+    variables
+All but the environment are kept in whyp's cache as a sorted list
+    which is searched by bisection for names with a given prefix
+    and is only rebuilt when PATH or the dumps of aliases or functions change
+Names which look like a given name are found with an index of trigrams
+    which is kept in a separate cache file, as only misses need it
+"""
+
+import os
+from bisect import bisect_left
+
+from whyp import why
+from whyp import cache
+from whyp import shell
+from whyp import arguments
+
+
+_index_version = 1
+
+
+def signature():
+    """Values which change when any source of known names changes"""
+    path_dirs = [_ for _ in shell.path_strings() if os.path.isdir(_)]
+    dumps = [arguments.get('aliases'), arguments.get('functions')]
+    return [[_, cache.signature(_)] for _ in path_dirs + dumps if _]
+
+
+def collect_names():
+    """All names of aliases, functions and executables in PATH, sorted"""
+    names = set(why.get_aliases())
+    names.update(why.get_function_index())
+    for _, path_names in shell.path_index():
+        names.update(path_names)
+    return sorted(names)
+
+
+def cached(name, build, signature_, type_):
+    """Data of that type kept in the cache under that name, built if stale"""
+    stored = cache.load(name, _index_version)
+    racy = any(cache.is_racy(s) for _, s in signature_)
+    fresh = cache.valid(stored, signature=list, data=type_) and (
+        stored['signature'] == signature_)
+    if fresh and not racy:
+        return stored['data']
+    data = build()
+    cache.save(name, _index_version, {'signature': signature_, 'data': data})
+    return data
+
+
+def known_names(signature_=None):
+    """A sorted list of all known names, except environment variables"""
+    return cached('names', collect_names, signature_ or signature(), list)
+
+
+def prefixed(names, prefix):
+    """Those sorted names which start with prefix
+
+    >>> prefixed(['a', 'ba', 'bb', 'c'], 'b')
+    ['ba', 'bb']
+    """
+    found = []
+    for name in names[bisect_left(names, prefix):]:
+        if not name.startswith(prefix):
+            break
+        found.append(name)
+    return found
+
+
+def complete(prefix):
+    """All known names which start with that prefix, sorted"""
+    names = prefixed(known_names(), prefix)
+    variables = prefixed(sorted(os.environ), prefix)
+    return sorted(set(names).union(variables))
+
+
+def trigrams(name):
+    """The three-letter pieces of a name, padded at each end
+
+    >>> sorted(trigrams('ls'))
+    ['  l', ' ls', 'ls ']
+    """
+    padded = '  %s ' % name
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def build_trigrams(names):
+    """An index of which names have each trigram
+
+    Gives {trigram: [index of a name in names, ...]}
+    """
+    index = {}
+    for i, name in enumerate(names):
+        for trigram in trigrams(name):
+            try:
+                index[trigram].append(i)
+            except KeyError:
+                index[trigram] = [i]
+    return index
+
+
+def suggestions(name, count=3, candidates=200):
+    """Up to count known names which look like that name, best first
+
+    The names sharing most trigrams with that name are candidates
+        and are then ranked by difflib, as close matches
+
+    >>> 'python' in suggestions('pyhton') or not shell.which('python')
+    True
+    """
+    import difflib
+    signature_ = signature()
+    names = known_names(signature_)
+    index = cached(
+        'trigrams', lambda: build_trigrams(names), signature_, dict)
+    shared = {}
+    for trigram in trigrams(name):
+        for i in index.get(trigram, []):
+            shared[i] = shared.get(i, 0) + 1
+    best = sorted(shared, key=lambda i: (-shared[i], names[i]))[:candidates]
+    close = [names[_] for _ in best if names[_] != name]
+    return difflib.get_close_matches(name, close, count)
@@ -0,0 +1,150 @@
+"""Run shell commands in one long-lived bash, instead of a new bash for each
+
+Each command's output is followed by a marker line holding its status
+    so that the output of one command can be told from the next
+The command's stderr goes to a file, which is read after the marker
+"""
+
+import os
+import shlex
+import tempfile
+import threading
+import subprocess
+
+from whyp import cache
+
+
+class CoprocessError(OSError):
+    """The coprocess stopped before answering"""
+    pass
+
+
+class Coprocess(object):
+    """A bash which runs commands sent to it, one at a time
+
+    Commands from several threads (see whyp/jobs.py) take turns
+    """
+
+    def __init__(self, bash):
+        self.token = 'whyp-%s' % os.urandom(16).hex()
+        self.marker = ('%s ' % self.token).encode()
+        fd, self.stderr_path = tempfile.mkstemp(prefix='whyp-stderr-')
+        os.close(fd)
+        self.process = subprocess.Popen(
+            [bash, '--noprofile', '--norc'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL)
+        self.pending = b''
+        self.sourced = {}
+        self.lock = threading.RLock()
+
+    def send(self, command):
+        """Send the command, with its stdin from /dev/null
+
+        The command is quoted for eval, so that a syntax error in it
+            cannot swallow the marker
+        """
+        framed = 'eval %s </dev/null 2>%s; printf "%s %%d\\n" $?\n' % (
+            shlex.quote(command), shlex.quote(self.stderr_path), self.token)
+        try:
+            self.process.stdin.write(framed.encode())
+            self.process.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            raise CoprocessError('bash coprocess has stopped')
+
+    def receive(self):
+        """Read output up to the next marker, giving the output and status"""
+        data = bytearray(self.pending)
+        fd = self.process.stdout.fileno()
+        searched = 0
+        while True:
+            found = data.find(self.marker, searched)
+            if found >= 0:
+                searched = found
+                end = data.find(b'\n', found)
+                if end >= 0:
+                    break
+            else:
+                searched = max(0, len(data) - len(self.marker))
+            chunk = os.read(fd, 1 << 16)
+            if not chunk:
+                self.pending = bytes(data)
+                raise CoprocessError('bash coprocess has stopped')
+            data += chunk
+        self.pending = bytes(data[end + 1:])
+        status = int(data[found + len(self.marker):end])
+        return bytes(data[:found]), status
+
+    def run(self, command):
+        """Run that command, giving its status, stdout and stderr
+
+        A command which stops bash (e.g. "exit 3") has bash's status
+            and whatever output it gave before stopping
+        Once sent, a command is never run again, even if bash stopped
+        """
+        with self.lock:
+            self.send(command)
+            try:
+                stdout, status = self.receive()
+            except CoprocessError:
+                stdout, self.pending = self.pending, b''
+                try:
+                    status = self.process.wait(timeout=1)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+                    status = self.process.wait()
+            with open(self.stderr_path, 'rb') as stream:
+                stderr = stream.read()
+            return status, stdout, stderr
+
+    def source(self, path_to_file):
+        """Source that file, unless it was sourced since it last changed"""
+        with self.lock:
+            signature = cache.signature(path_to_file)
+            if cache.unchanged(self.sourced.get(path_to_file), signature):
+                return True
+            status, _, _ = self.run('shopt -s extglob; . %s' % path_to_file)
+            self.sourced[path_to_file] = signature
+            return not status
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process.stdout.close()
+        if os.path.exists(self.stderr_path):
+            os.remove(self.stderr_path)
+
+
+# volatile to importers
+enabled = True
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared(bash):
+    """The coprocess for this run of whyp, or None if not enabled"""
+    global _shared
+    if not enabled:
+        return None
+    with _shared_lock:
+        if not _shared or _shared.process.poll() is not None:
+            try:
+                _shared = Coprocess(bash)
+            except OSError:
+                return None
+        return _shared
+
+
+def close():
+    """Stop the coprocess for this run, if any"""
+    global _shared
+    with _shared_lock:
+        if _shared:
+            _shared.close()
+            _shared = None
@@ -0,0 +1,226 @@
+"""Keep whyp running, to answer queries over a Unix socket
+
+A query saves starting python, importing whyp, and reading dumps again
+    because parsed aliases, functions, and PATH are kept between queries
+
+A query is one line of tab-separated words: the pid, working directory
+    and PATH of the asking shell, a program (whyp or python), then its args
+The program is run in that directory, with that PATH
+The answer is the program's exit status on one line, then its output
+"""
+
+import io
+import os
+import sys
+import time
+import struct
+import socket
+import socketserver
+from contextlib import contextmanager, redirect_stdout, redirect_stderr
+
+from whyp import why
+from whyp import python
+from whyp import session
+from whyp import arguments
+
+
+def socket_path():
+    """Where the daemon listens, one socket for each user"""
+    path = os.environ.get('WHYP_SOCKET')
+    if path:
+        return path
+    return os.path.join(session.runtime_directory(), 'daemon.sock')
+
+
+def run_whyp(args):
+    from whyp import __main__
+    return __main__.main(args)
+
+
+programs = {
+    'whyp': run_whyp,
+    'python': python.main,
+}
+
+
+def run(program, args):
+    """Run that program with those args, giving its status and output"""
+    if program not in programs:
+        return 2, ('Unknown program: %r\n' % program).encode()
+    stream = io.TextIOWrapper(
+        io.BytesIO(), encoding='utf-8', write_through=True)
+    stdin, sys.stdin = sys.stdin, io.StringIO()
+    with redirect_stdout(stream), redirect_stderr(stream):
+        try:
+            status = os.EX_OK if programs[program](args) else 1
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else 1
+        except Exception as e:  # pylint: disable=broad-except
+            print('%s: %s' % (e.__class__.__name__, e))
+            status = 1
+        finally:
+            sys.stdin = stdin
+    stream.flush()
+    return status, stream.detach().getvalue()
+
+
+@contextmanager
+def shell_environment(cwd, path):
+    """Run in that working directory, with that PATH, as the asking shell"""
+    saved_cwd, saved_path = os.getcwd(), os.environ.get('PATH')
+    os.chdir(cwd)
+    os.environ['PATH'] = path
+    try:
+        yield
+    finally:
+        os.chdir(saved_cwd)
+        if saved_path is None:
+            del os.environ['PATH']
+        else:
+            os.environ['PATH'] = saved_path
+
+
+class Handler(socketserver.StreamRequestHandler):
+    """Answer one query"""
+
+    def peer_uid(self):
+        """The user id of the process asking, or None if it is unknown"""
+        option = getattr(socket, 'SO_PEERCRED', None)
+        if option is None:
+            return None
+        size = struct.calcsize('3i')
+        credentials = self.request.getsockopt(socket.SOL_SOCKET, option, size)
+        _, uid, _ = struct.unpack('3i', credentials)
+        return uid
+
+    def handle(self):
+        uid = self.peer_uid()
+        if uid is not None and uid != os.getuid():
+            self.wfile.write(b'2\nPermission denied\n')
+            return
+        line = self.rfile.readline().decode().rstrip('\n')
+        if not line:
+            return
+        try:
+            pid, cwd, path, program, *args = line.split('\t')
+            pid = int(pid)
+        except ValueError:
+            self.wfile.write(b'2\nBad query\n')
+            return
+        try:
+            with shell_environment(cwd, path):
+                status, output = run(program, args)
+        except OSError as e:
+            status, output = 2, ('%s\n' % e).encode()
+        self.server.remember(pid)
+        self.wfile.write(b'%d\n' % status)
+        self.wfile.write(output)
+
+
+class Server(socketserver.UnixStreamServer):
+    """Answers queries one at a time, keeping state for each shell
+
+    The state for a shell is the dumps it asked about
+        which are forgotten once that shell has gone
+    """
+
+    def __init__(self, path):
+        self.sessions = {}
+        self.last_query = time.monotonic()
+        super().__init__(path, Handler)
+
+    def remember(self, pid):
+        """Add the dumps used by the last query to that shell's session"""
+        self.last_query = time.monotonic()
+        dumps = [arguments.get(_) for _ in ('aliases', 'functions', 'hashed')]
+        used = self.sessions.setdefault(pid, set())
+        used.update(_ for _ in dumps if _)
+
+    def collect_garbage(self):
+        """Forget sessions of shells which are no longer running
+
+        Their session directories are removed too
+        """
+        gone = [_ for _ in self.sessions if not session.is_running(_)]
+        for pid in gone:
+            dumps = self.sessions.pop(pid)
+            in_use = {_ for d in self.sessions.values() for _ in d}
+            for dump in dumps:
+                if dump not in in_use:
+                    why.forget_dump(dump)
+        if gone:
+            session.collect_garbage()
+
+    def serve_until_idle(self, idle):
+        """Answer queries until none have arrived for idle seconds"""
+        self.timeout = min(idle, 1.0)
+        while time.monotonic() - self.last_query < idle:
+            self.handle_request()
+            self.collect_garbage()
+
+
+def is_listening(path=None):
+    """Whether a daemon is answering on that path"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(path or socket_path())
+        except OSError:
+            return False
+    return True
+
+
+def bind(path=None):
+    """A Server listening on that path, or None if one is already there
+
+    Raises PermissionError if the directory of that path is not private
+    """
+    path = path or socket_path()
+    session.make_private(os.path.dirname(path))
+    if os.path.exists(path):
+        if is_listening(path):
+            return None
+        os.remove(path)
+    return Server(path)
+
+
+def serve(idle, path=None):
+    """Answer queries on that path, until idle for that many seconds"""
+    try:
+        server = bind(path)
+    except PermissionError as e:
+        print(e, file=sys.stderr)
+        return False
+    if not server:
+        return False
+    with server:
+        try:
+            server.serve_until_idle(idle)
+        finally:
+            os.remove(server.server_address)
+    return True
+
+
+def query(program, args, pid=None, path=None, cwd=None, search_path=None):
+    """Ask a daemon to run that program with those args
+
+    The program runs in cwd with search_path as its PATH
+        (by default this process's working directory and PATH)
+    Gives the program's status and output
+    """
+    words = [
+        str(pid or os.getppid()),
+        cwd or os.getcwd(),
+        search_path or os.environ.get('PATH', ''),
+        program,
+    ] + list(args)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(path or socket_path())
+        client.sendall(('\t'.join(words) + '\n').encode())
+        chunks = []
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    status, output = b''.join(chunks).split(b'\n', 1)
+    return int(status), output
@@ -0,0 +1,193 @@
+"""Show bash and python source in colour, without starting a pager
+
+Source is tokenised a line at a time, carrying any open string to the
+    next line, so that only the lines to be shown are ever read
+Lines are written as they are coloured, so a large file is never held
+    in memory, and only renders of a few lines are kept for later
+"""
+
+import os
+import re
+import sys
+import keyword
+import builtins
+import threading
+
+from whyp.why import bash_keywords
+from whyp.why import bash_builtins
+
+
+colours = {
+    'keyword': '\033[1;34m',
+    'builtin': '\033[36m',
+    'string': '\033[32m',
+    'comment': '\033[2m',
+    'number': '\033[35m',
+    'variable': '\033[33m',
+}
+reset = '\033[0m'
+
+python_builtins = {_ for _ in dir(builtins) if not _.startswith('_')}
+
+_bash_tokens = re.compile(r'''
+    (?P<comment>(?:^|(?<=\s))\#.*)
+  | (?P<string>'[^']*'|"(?:\\.|[^"\\])*")
+  | (?P<open_string>['"].*)
+  | (?P<variable>\$\{[^}]*\}|\$\w+|\$[@#?$!*-])
+  | (?P<number>\b\d+\b)
+  | (?P<word>\[\[|\]\]|[\w.-]+)
+''', re.VERBOSE)
+
+_python_tokens = re.compile(r'''
+    (?P<comment>\#.*)
+  | (?P<string>[rbuf]{0,2}(?:"""(?:\\.|[^\\])*?"""|\'\'\'(?:\\.|[^\\])*?\'\'\'
+        |'(?!'')(?:\\.|[^'\\])*'|"(?!"")(?:\\.|[^"\\])*"))
+  | (?P<open_string>[rbuf]{0,2}(?:"""|\'\'\').*)
+  | (?P<number>\b\d[\d_.eEjx]*\b)
+  | (?P<word>\w+)
+''', re.VERBOSE | re.IGNORECASE)
+
+
+def paint(kind, text):
+    return '%s%s%s' % (colours[kind], text, reset)
+
+
+def word_kind(language, word):
+    """The kind of that word in that language, or None"""
+    if language == 'python':
+        if keyword.iskeyword(word):
+            return 'keyword'
+        return 'builtin' if word in python_builtins else None
+    if word in bash_keywords:
+        return 'keyword'
+    return 'builtin' if word in bash_builtins else None
+
+
+def closing(language, opened):
+    """The quote which would end a string opened by that text"""
+    quote = opened.lstrip('rbufRBUF')
+    if language == 'python':
+        return quote[:3]
+    return quote[0]
+
+
+def highlight_line(line, language, state=None):
+    """That line in colour, and any string left open at its end
+
+    state is the quote of a string left open by an earlier line
+    """
+    out = []
+    if state:
+        end = line.find(state)
+        if end < 0:
+            return paint('string', line), state
+        end += len(state)
+        out.append(paint('string', line[:end]))
+        line = line[end:]
+    tokens = _python_tokens if language == 'python' else _bash_tokens
+    position = 0
+    state = None
+    for match in tokens.finditer(line):
+        out.append(line[position:match.start()])
+        kind, text = match.lastgroup, match.group()
+        position = match.end()
+        if kind == 'open_string':
+            state = closing(language, text)
+            out.append(paint('string', text))
+            break
+        if kind == 'word':
+            kind = word_kind(language, text)
+        out.append(paint(kind, text) if kind else text)
+    out.append(line[position:])
+    return ''.join(out), state
+
+
+def highlight_lines(lines, language):
+    """Each of those lines, in colour"""
+    state = None
+    for line in lines:
+        text = line.rstrip('\n')
+        highlighted, state = highlight_line(text, language, state)
+        yield highlighted + line[len(text):]
+
+
+def guess_language(path_to_file):
+    """python for .py files, otherwise bash"""
+    _, ext = os.path.splitext(path_to_file or '')
+    return 'python' if ext == '.py' else 'bash'
+
+
+def read_lines(path_to_file, count=None):
+    """The first count lines of that file (or all, if count is None)"""
+    with open(path_to_file, errors='replace') as stream:
+        for number, line in enumerate(stream):
+            if count is not None and number >= count:
+                break
+            yield line
+
+
+def render_lines(path_to_file, language=None, count=None):
+    """Each of the first count lines of that file, in colour"""
+    language = language or guess_language(path_to_file)
+    return highlight_lines(read_lines(path_to_file, count), language)
+
+
+_rendered = {}
+_rendered_limit = 32
+# Commands may be shown in threads (see whyp/jobs.py), which share _rendered
+_rendered_lock = threading.Lock()
+
+# Renders of at most this many lines are kept
+cached_lines = 200
+
+
+def render_file(path_to_file, language=None, count=None):
+    """The first count lines of that file, in colour
+
+    Renders of up to cached_lines lines are cached
+        by the file's path and mtime
+    """
+    if count is None or count > cached_lines:
+        return ''.join(render_lines(path_to_file, language, count))
+    status = os.stat(path_to_file)
+    key = path_to_file, status.st_mtime_ns, status.st_size, language, count
+    with _rendered_lock:
+        try:
+            return _rendered[key]
+        except KeyError:
+            pass
+    rendered = ''.join(render_lines(path_to_file, language, count))
+    with _rendered_lock:
+        while len(_rendered) >= _rendered_limit:
+            _rendered.pop(next(iter(_rendered)))
+        _rendered[key] = rendered
+    return rendered
+
+
+# volatile to importers
+lines = None
+
+
+def write_lines(highlighted):
+    """Write those lines to stdout, as each is ready"""
+    line = ''
+    for line in highlighted:
+        sys.stdout.write(line)
+    if line and not line.endswith('\n'):
+        sys.stdout.write('\n')
+    sys.stdout.flush()
+
+
+def view_file(path_to_file=None, text=None, language=None):
+    """Show that file (or that text from it) in colour on stdout
+
+    Any callable with these arguments can be used as why.Bash.view_file
+    """
+    if text is not None:
+        language = language or guess_language(path_to_file)
+        text_lines = text.splitlines(True)[:lines]
+        write_lines(highlight_lines(text_lines, language))
+    elif lines is not None and lines <= cached_lines:
+        write_lines([render_file(str(path_to_file), language, lines)])
+    else:
+        write_lines(render_lines(str(path_to_file), language, lines))
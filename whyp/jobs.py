@@ -0,0 +1,82 @@
+"""Run a method on several items at once, keeping their output in order
+
+Each item is handled in a thread of a pool, and whatever that thread
+    writes to sys.stdout or sys.stderr is kept in a buffer of its own
+Buffers are given back in the order of the items, as each is ready
+    so output looks as if the items had been handled one after another
+"""
+
+import io
+import sys
+import threading
+
+
+class ThreadStream(object):
+    """Stands in for a stream, keeping each capturing thread's writes apart
+
+    Threads which are not capturing write to the stream itself
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def target(self):
+        return getattr(self.local, 'buffer', None) or self.stream
+
+    def __getattr__(self, name):
+        return getattr(self.target(), name)
+
+    def capture(self):
+        """Start keeping this thread's writes in a buffer"""
+        encoding = getattr(self.stream, 'encoding', None) or 'utf-8'
+        self.local.buffer = io.TextIOWrapper(
+            io.BytesIO(), encoding=encoding, errors='replace',
+            write_through=True)
+
+    def release(self):
+        """Stop keeping this thread's writes, giving what was written"""
+        buffer, self.local.buffer = self.local.buffer, None
+        buffer.flush()
+        return buffer.buffer.getvalue()
+
+
+def write_bytes(stream, data):
+    """Write that data to the stream, as bytes if the stream takes them"""
+    if not data:
+        return
+    stream.flush()
+    try:
+        stream.buffer.write(data)
+        stream.buffer.flush()
+    except AttributeError:
+        stream.write(data.decode(errors='replace'))
+        stream.flush()
+
+
+def in_order(method, items, jobs):
+    """Call that method for each item, using up to that many threads
+
+    Gives (result, stdout, stderr) for each item, in the order of the items
+        where stdout and stderr are the bytes written while handling it
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    stdout, stderr = ThreadStream(sys.stdout), ThreadStream(sys.stderr)
+
+    def captured(item):
+        stdout.capture()
+        stderr.capture()
+        try:
+            result = method(item)
+        finally:
+            output, errors = stdout.release(), stderr.release()
+        return result, output, errors
+
+    sys.stdout, sys.stderr = stdout, stderr
+    try:
+        with ThreadPoolExecutor(jobs) as pool:
+            futures = [pool.submit(captured, _) for _ in items]
+            for future in futures:
+                yield future.result()
+    finally:
+        sys.stdout, sys.stderr = stdout.stream, stderr.stream
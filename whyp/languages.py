@@ -0,0 +1,192 @@
+"""Guess the language of a file from the first few bytes of it
+
+Only a small prefix of each file is read, in binary,
+    so large binaries are recognised by their magic number without decoding
+Answers are kept for each file until its inode or mtime changes
+"""
+
+import os
+import re
+
+
+prefix_size = 256
+
+magic_numbers = [
+    (b'\x7fELF', 'elf'),
+    (b'\xcf\xfa\xed\xfe', 'mach-o'),
+    (b'\xce\xfa\xed\xfe', 'mach-o'),
+    (b'\xca\xfe\xba\xbe', 'mach-o'),
+    (b'MZ', 'pe'),
+    (b'PK\x03\x04', 'zip'),
+    (b'\x1f\x8b', 'gzip'),
+]
+
+extensions = {'.py': 'python', '.sh': 'bash'}
+
+
+def read_prefix(path_to_file, size=None):
+    """The first size bytes of that file, or b'' if it cannot be read"""
+    try:
+        with open(path_to_file, 'rb') as stream:
+            return stream.read(size or prefix_size)
+    except (OSError, ValueError):
+        return b''
+
+
+def magic(prefix):
+    """The kind of binary which starts with that prefix, or None
+
+    >>> magic(b'\\x7fELF\\x02\\x01')
+    'elf'
+    >>> magic(b'#! /bin/sh') is None
+    True
+    """
+    for number, kind in magic_numbers:
+        if prefix.startswith(number):
+            return kind
+    return None
+
+
+def shebang(prefix):
+    """The shebang line at the start of that prefix, without the "#!"
+
+    >>> shebang(b'#! /usr/bin/env python\\nimport os\\n')
+    '/usr/bin/env python'
+    >>> shebang(b'import os\\n')
+    ''
+    """
+    if not prefix.startswith(b'#!'):
+        return ''
+    line = prefix[2:].split(b'\n', 1)[0]
+    return line.decode('utf-8', errors='replace').strip()
+
+
+# env's options which take an argument, given in the next word if not attached
+env_short_arguments = 'uCPa'
+env_long_arguments = ('--unset', '--chdir', '--argv0')
+
+
+def env_command(args):
+    """The command which env would run with those args, or None
+
+    env's options are skipped, with the arguments of those which take one
+        and so are any variables set for the command
+    -S (--split-string) gives more args, which are read in the same way
+
+    >>> env_command(['-u', 'PYTHONPATH', 'python3'])
+    'python3'
+    >>> env_command(['-iC/tmp', '--unset=HOME', 'python3'])
+    'python3'
+    >>> env_command(['--chdir', '/tmp', '-S', 'X=1', 'perl', '-w'])
+    'perl'
+    >>> env_command(['--split-string=-u', 'X', 'ruby'])
+    'ruby'
+    >>> env_command(['-v', '--', 'X=1', '-python'])
+    '-python'
+    >>> env_command(['-u', 'PATH']) is None
+    True
+    """
+    args = list(args)
+    options = True
+    while args:
+        arg = args.pop(0)
+        if options and arg == '--':
+            options = False
+        elif options and arg.startswith('--'):
+            name, equals, value = arg.partition('=')
+            if name == '--split-string' and equals:
+                args.insert(0, value)
+            elif name in env_long_arguments and not equals:
+                del args[:1]
+        elif options and arg.startswith('-') and len(arg) > 1:
+            for i, option in enumerate(arg[1:], 2):
+                if option == 'S':
+                    if arg[i:]:
+                        args.insert(0, arg[i:])
+                    break
+                if option in env_short_arguments:
+                    if not arg[i:]:
+                        del args[:1]
+                    break
+        elif '=' not in arg:
+            return arg
+    return None
+
+
+def interpreter(shebang_line):
+    """The name of the program which runs a shebang line
+
+    Options and arguments of the interpreter are ignored,
+        as are env's own options (see env_command()) and variables
+
+    >>> interpreter('/bin/bash -e')
+    'bash'
+    >>> interpreter('/usr/bin/env -S PYTHONPATH=. python3 -u')
+    'python3'
+    >>> interpreter('/usr/bin/env -Spython3 -u')
+    'python3'
+    >>> interpreter('/usr/bin/env -u VAR python')
+    'python'
+    >>> interpreter('/usr/bin/env -C /tmp python')
+    'python'
+    """
+    words = shebang_line.split()
+    if not words:
+        return None
+    command, args = os.path.basename(words[0]), words[1:]
+    if command != 'env':
+        return command
+    return os.path.basename(env_command(args) or command)
+
+
+def extension_language(path_to_file):
+    """Guess the language used to run a file from its extension"""
+    _, extension = os.path.splitext(path_to_file)
+    return extensions.get(extension, None)
+
+
+def prefix_language(path_to_file, prefix):
+    """The language of a file which starts with that prefix
+
+    A binary gives its kind, a script gives its interpreter
+        and anything else is guessed from the file's extension
+    """
+    return (magic(prefix) or interpreter(shebang(prefix))
+            or extension_language(path_to_file))
+
+
+_languages = {}
+
+
+def language(path_to_file):
+    """Guess the language of that file
+
+    >>> language('whyp.py')
+    'python'
+    """
+    try:
+        status = os.stat(path_to_file)
+    except (OSError, ValueError):
+        return extension_language(path_to_file)
+    key = str(path_to_file), status.st_dev, status.st_ino, status.st_mtime_ns
+    try:
+        return _languages[key]
+    except KeyError:
+        pass
+    prefix = read_prefix(path_to_file) if status.st_size else b''
+    result = _languages[key] = prefix_language(path_to_file, prefix)
+    return result
+
+
+def clear():
+    """Forget all languages found so far"""
+    _languages.clear()
+
+
+def family(language_):
+    """That language without a version
+
+    >>> family('python3.11')
+    'python'
+    """
+    return re.sub(r'[\d.]+$', '', language_ or '')
@@ -13,61 +13,132 @@ import os
 from io import StringIO
 import sys
 import argparse
-import fnmatch
 import importlib
+import importlib.util
+import importlib.machinery
+from functools import lru_cache
 from bdb import BdbQuit
 from contextlib import contextmanager
 
+try:
+    from importlib import metadata
+except ImportError:
+    metadata = None
+
 from pysyte.types import paths
 
 from whyp import __version__
 from whyp import arguments
+from whyp import cache
+
+
+_extension_suffixes = tuple(importlib.machinery.EXTENSION_SUFFIXES)
 
 
-def directory_list(path):
-    """A list of all items in that path
+def entry_kind(entry):
+    """What kind of python item that directory entry is, or None
 
-    If path is not a directory, an empty list
+    Kinds are "directory", "source", "compiled" (any other .py*),
+        or "extension"
     """
-    if not os.path.isdir(path):
-        return []
-    return os.listdir(path)
+    try:
+        if entry.is_dir():
+            return 'directory', entry.name
+        if not entry.is_file():
+            return None
+    except OSError:
+        return None
+    name, ext = os.path.splitext(entry.name)
+    if ext == '.py':
+        return 'source', name
+    if ext.startswith('.py'):
+        return 'compiled', name
+    if entry.name.endswith(_extension_suffixes):
+        return 'extension', entry.name.split('.')[0]
+    return None
 
 
-def is_file_in(path, name):
-    """Whether that name is a file in the directory at that path"""
-    path_to_name = os.path.join(path, name)
-    return os.path.isfile(path_to_name)
+def scan_directory(path):
+    """Index the python items in that directory, from one scandir
+
+    Gives a dictionary of {name: {kind: filename}}
+    """
+    index = {}
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                kind_name = entry_kind(entry)
+                if not kind_name:
+                    continue
+                kind, name = kind_name
+                index.setdefault(name, {}).setdefault(kind, entry.name)
+    except OSError:
+        pass
+    return index
+
 
+_indexes = {}
+_index_version = 1
 
-def is_matching_file_in(path, name, glob):
-    """Whether that name is a file in path and matches that glob"""
-    return is_file_in(path, name) and fnmatch.fnmatch(name, glob)
+# volatile to importers
+persistent = False
+
+
+def load_indexes():
+    """Read any indexes saved by an earlier run"""
+    if persistent and not _indexes:
+        stored = cache.load('sys_path', _index_version)
+        if not isinstance(stored, dict):
+            return
+        _indexes.update({
+            k: tuple(v) for k, v in stored.items()
+            if isinstance(v, list) and len(v) == 2 and isinstance(v[1], dict)
+        })
+
+
+def save_indexes():
+    """Keep indexes for a later run, if asked to"""
+    if persistent and _indexes:
+        cache.save('sys_path', _index_version, _indexes)
+
+
+def directory_index(path):
+    """The index of python items in that directory
+
+    Each directory is scanned once,
+        and again only if its signature changes
+    """
+    load_indexes()
+    signature = cache.signature(path)
+    try:
+        known, index = _indexes[path]
+        if cache.unchanged(known, signature):
+            return index
+    except KeyError:
+        pass
+    index = scan_directory(path) if signature else {}
+    _indexes[path] = signature, index
+    return index
 
 
 def path_to_module(path, name):
     """Whether the name matches a python source or compiled file in that path
 
     If source and compiled files are found, give the source
+    Failing those, give an extension module
     """
-    glob = '%s.py*' % name
-    python_files = [f
-                    for f in directory_list(path)
-                    if is_matching_file_in(path, f, glob)]
-    if not python_files:
-        return None
-    source_files = [f
-                    for f in python_files
-                    if os.path.splitext(f)[-1] == '.py']
-    python_file = source_files and source_files[0] or python_files[0]
-    return os.path.join(path, python_file)
+    kinds = directory_index(path).get(name, {})
+    for kind in ('source', 'compiled', 'extension'):
+        if kind in kinds:
+            return os.path.join(path, kinds[kind])
+    return None
 
 
 def path_to_sub_directory(path, name):
     """If name is a real sub-directory of path, return that"""
-    result = os.path.join(path, name)
-    if os.path.isdir(result):
-        return os.path.normpath(result)
+    if 'directory' in directory_index(path).get(name, {}):
+        return os.path.normpath(os.path.join(path, name))
+    return None
 
 
 def path_to_python(path, name):
@@ -78,6 +149,12 @@ def path_to_python(path, name):
     return path_to_module(path, name)
 
 
+def sys_path_pythons(name):
+    """Paths to modules or sub-dirs with that name, in each of sys.path"""
+    pythons = [path_to_python(_ or os.getcwd(), name) for _ in sys.path]
+    return [_ for _ in pythons if _]
+
+
 @contextmanager
 def swallow_stdout_stderr():
     """Divert stdout into the given stream """
@@ -92,8 +169,86 @@ def swallow_stdout_stderr():
         sys.stderr = saved_err
 
 
-def built_in(name):
-    """Whether the name is that of one of python's builtin modules"""
+def find_spec(name):
+    """The spec python would use to import that module, or None
+
+    Parent packages are searched through their specs too
+        so no module's code is run, unlike importlib.util.find_spec()
+    """
+    if name in sys.modules:
+        return getattr(sys.modules[name], '__spec__', None)
+    spec = search = None
+    parts = name.split('.')
+    for i in range(len(parts)):
+        if i and search is None:
+            return None
+        full_name = '.'.join(parts[:i + 1])
+        try:
+            spec = importlib.util.find_spec(full_name) if not i else (
+                find_sub_spec(full_name, search))
+        except (ImportError, ValueError):
+            return None
+        if not spec:
+            return None
+        search = spec.submodule_search_locations
+    return spec
+
+
+def find_sub_spec(name, search):
+    """The spec of a sub-module, in those search locations"""
+    for finder in sys.meta_path:
+        try:
+            find = finder.find_spec
+        except AttributeError:
+            continue
+        spec = find(name, search)
+        if spec:
+            return spec
+    return None
+
+
+def spec_path(spec):
+    """The path to the file (or directory) from which the spec would load"""
+    origin = spec.origin
+    if origin == 'frozen':
+        return getattr(spec.loader_state, 'filename', None)
+    if origin and os.path.exists(origin):
+        return origin
+    if spec.submodule_search_locations:
+        return list(spec.submodule_search_locations)[0]
+    return None
+
+
+@lru_cache(maxsize=None)
+def module_distributions():
+    """Names of distributions which provide each top level module"""
+    try:
+        return metadata.packages_distributions()
+    except AttributeError:
+        return {}
+
+
+def distribution_version(name):
+    """The version of the installed distribution providing that module
+
+    Read from the distribution's metadata, so the module is not imported
+    """
+    if not metadata:
+        return None
+    top_name = name.split('.')[0]
+    for distribution in module_distributions().get(top_name, [top_name]):
+        try:
+            return metadata.version(distribution)
+        except metadata.PackageNotFoundError:
+            continue
+    return None
+
+
+def imported_built_in(name):
+    """Whether the name is that of one of python's builtin modules
+
+    This imports the module, running its code
+    """
     try:
         #  Not all builtin modules are initially imported, so bring it in first
         with swallow_stdout_stderr():
@@ -103,6 +258,14 @@ def built_in(name):
     return '(built-in)' in str(sys.modules[name])
 
 
+def built_in(name):
+    """Whether the name is that of one of python's builtin modules"""
+    if arguments.get('import'):
+        return imported_built_in(name)
+    spec = find_spec(name)
+    return bool(spec) and spec.origin == 'built-in'
+
+
 def run_args(args, methods):
     """Run any methods eponymous with args"""
     if not args:
@@ -131,6 +294,36 @@ def look_here(_name):
 
 
 def path_to_import(string):
+    """The path to that module, and its version
+
+    The module is imported only if the user asked for that
+    """
+    if arguments.get('import'):
+        return imported_path(string)
+    with look_here(string):
+        spec = find_spec(string)
+        path = spec and spec_path(spec)
+    if not path:
+        if not arguments.get('quiet'):
+            sys.stderr.write('%s\n' % string)
+        return None, None
+    if '.egg/' in path:
+        return egg_path(path)
+    if path.endswith('.py'):
+        path = os.path.realpath(path)
+    return path, distribution_version(string)
+
+
+def egg_path(path):
+    """The egg holding that path, and the egg's version"""
+    dirname = path.split('.egg/')[0] + '.egg'
+    name = os.path.basename(dirname)
+    version_ = name.split('-')[1]
+    return dirname, version_
+
+
+def imported_path(string):
+    """The path to that module, and its version, found by importing it"""
     with look_here(string):
         try:
             with swallow_stdout_stderr():
@@ -139,13 +332,10 @@ def path_to_import(string):
             if not arguments.get('quiet'):
                 sys.stderr.write('%s\n' % string)
             return None, None
-    if module:
+    if module and getattr(module, '__file__', None):
         pyc = module.__file__
         if '.egg/' in pyc:
-            dirname = pyc.split('.egg/')[0] + '.egg'
-            name = os.path.basename(dirname)
-            version_ = name.split('-')[1]
-            return dirname, version_
+            return egg_path(pyc)
         py = os.path.realpath(os.path.splitext(pyc)[0] + '.py')
         filename = py if os.path.isfile(py) else pyc
         try:
@@ -189,7 +379,63 @@ def module_paths(modules):
     return strings;
 
 
+def show_all():
+    """Show every python file or directory for each module in sys.path"""
+    found = False
+    for module in arguments.get('modules'):
+        for path in sys_path_pythons(module):
+            show(path)
+            found = True
+    save_indexes()
+    return found
+
+
+def show_pythons(executables):
+    """Show where each of those pythons finds each module
+
+    Each python is started once, as a worker, for all the modules
+    """
+    from whyp import workers
+    question = 'imports' if arguments.get('import') else 'locate'
+    found = True
+    for executable, name, path in workers.ask_all(
+            executables, question, arguments.get('modules')):
+        if not path:
+            found = False
+            continue
+        if arguments.get('version'):
+            path = '%s: %s' % (path, workers.ask(executable, 'version', name))
+        if len(executables) > 1:
+            path = '%s: %s' % (executable, path)
+        show(path)
+    return found
+
+
+def show_executables(executables):
+    """Show the sys.executable of each of those pythons
+
+    Each python is asked through its worker, which is kept for later questions
+    """
+    from whyp import workers
+    found = True
+    for executable in executables:
+        path = workers.ask(executable, 'executable')
+        if not path:
+            found = False
+            continue
+        show(path)
+    return found
+
+
 def script():
+    global persistent
+    persistent = persistent or bool(arguments.get('cache'))
+    if arguments.get('executable'):
+        return show_executables(arguments.get('python') or [sys.executable])
+    if arguments.get('all'):
+        return show_all()
+    if arguments.get('python'):
+        return show_pythons(arguments.get('python'))
     found = False
     modules = set()
     for module in arguments.get('modules'):
@@ -209,3 +455,32 @@ def script():
     string = ' '.join(sorted([str(p) for p in paths_]))
     show(string)
     return bool(string)
+
+
+def parse_args(args=None):
+    """Look for options from user on the command line for whyp-python"""
+    parser = arguments.parser(__doc__)
+    pa = parser.add_argument
+    pa('modules', nargs='*', help='the modules python might import')
+    pa('-q', '--quiet', action='store_true', help='do not show any output')
+    pa('-v', '--version', action='store_true', help='show module version')
+    pa('-i', '--import', action='store_true',
+       help='import modules to find them (which runs their code)')
+    pa('-a', '--all', action='store_true',
+       help='show all files or directories for each module in sys.path')
+    pa('-c', '--cache', action='store_true',
+       help='keep indexes of sys.path directories for later runs')
+    pa('-p', '--python', action='append',
+       help='ask that python executable where it finds modules')
+    pa('-e', '--executable', action='store_true',
+       help='show the executable which each python runs as')
+    parsed = arguments.parse_args(args)
+    if not parsed.modules and not parsed.executable:
+        parser.error('the following arguments are required: modules')
+    return parsed
+
+
+def main(args=None):
+    """Run whyp-python with those args"""
+    parse_args(args)
+    return script()
@@ -0,0 +1,129 @@
+"""Keep the dumps of each shell in a directory of its own
+
+Each shell writes its aliases and functions to a session directory
+    under the user's runtime directory ($XDG_RUNTIME_DIR, usually a tmpfs)
+    so that shells never overwrite each other's dumps
+A session directory is named for the pid of its shell
+    and is removed once that shell has gone
+
+The runtime directory may be in a shared /tmp, where another user could
+    have made it first, so it is only used if it is private to this user
+"""
+
+import os
+import stat
+import shutil
+
+
+def runtime_directory():
+    """The directory which holds this user's whyp state, e.g. daemon sockets"""
+    root = os.environ.get('XDG_RUNTIME_DIR') or '/tmp'
+    return os.path.join(root, 'whyp-%s' % os.getuid())
+
+
+def check_private(path):
+    """Raise PermissionError unless that directory is only for this user
+
+    It must be a real directory (not a link), owned by this user,
+        with no permissions for group or others
+    """
+    status = os.lstat(path)
+    if not stat.S_ISDIR(status.st_mode):
+        raise PermissionError('Not a directory: %r' % path)
+    if status.st_uid != os.getuid():
+        raise PermissionError('Owned by another user: %r' % path)
+    if status.st_mode & 0o077:
+        raise PermissionError('Open to other users: %r' % path)
+    return path
+
+
+def make_private(path):
+    """Make that directory (and parents) only for this user, if not there
+
+    Raises PermissionError if it was there, but is not private
+    """
+    umask = os.umask(0o077)
+    try:
+        os.makedirs(path, exist_ok=True)
+    finally:
+        os.umask(umask)
+    return check_private(path)
+
+
+def is_private(path):
+    """Whether that directory is there, and only for this user"""
+    try:
+        check_private(path)
+    except OSError:
+        return False
+    return True
+
+
+def is_trusted(path_to_file):
+    """Whether a dump at that path may be read
+
+    A dump under the runtime directory is only trusted if every directory
+        from the runtime directory down to the dump is private
+    Dumps elsewhere were named by the user, and are trusted
+    """
+    runtime = runtime_directory()
+    if not path_to_file or not path_to_file.startswith(runtime + os.sep):
+        return True
+    path = os.path.dirname(path_to_file)
+    while True:
+        if os.path.lexists(path) and not is_private(path):
+            return False
+        if path == runtime:
+            return True
+        path = os.path.dirname(path)
+
+
+def sessions_directory():
+    """The directory which holds a directory for each session"""
+    return os.path.join(runtime_directory(), 'sessions')
+
+
+def directory(pid=None):
+    """The directory for that shell's session, $WHYP_SESSION_DIR if set
+
+    Without a pid (or $WHYP_SESSION_DIR) this is the session of
+        the shell which started this process
+    """
+    if not pid:
+        path = os.environ.get('WHYP_SESSION_DIR')
+        if path:
+            return path
+    return os.path.join(sessions_directory(), str(pid or os.getppid()))
+
+
+def path_to(name, pid=None):
+    """The path to a file with that name in that shell's session"""
+    return os.path.join(directory(pid), name)
+
+
+def is_running(pid):
+    """Whether there is a process with that pid"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect_garbage():
+    """Remove directories of sessions whose shell has gone
+
+    Gives the pids of those sessions
+    """
+    if not is_private(runtime_directory()):
+        return []
+    try:
+        names = os.listdir(sessions_directory())
+    except OSError:
+        return []
+    gone = [int(_) for _ in names if _.isdigit() and not is_running(int(_))]
+    for pid in gone:
+        shutil.rmtree(directory(pid), ignore_errors=True)
+    return gone
@@ -1,6 +1,16 @@
 import os
+import stat
 
-from pysyte.types.paths import path
+from whyp import cache
+
+
+def path(string):
+    """A pysyte path to that string
+
+    pysyte is slow to import, so it is only imported once a path is needed
+    """
+    from pysyte.types.paths import path as pysyte_path
+    return pysyte_path(string)
 
 
 def value(key):
@@ -11,38 +21,233 @@ def value(key):
     return os.environ.get(key, '')
 
 
+def path_strings(name=None):
+    """A list of the directories in the environment's PATH, as strings
+
+    >>> assert '/bin' in path_strings()
+    """
+    return value(name or 'PATH').split(':')
+
+
 def paths(name=None):
     """A list of paths in the environment's PATH
 
     >>> assert '/bin' in paths()
     """
-    path_value = value(name or 'PATH')
-    path_strings = path_value.split(':')
-    path_paths = [path(_) for _ in path_strings]
-    return path_paths
+    return [path(_) for _ in path_strings(name)]
+
+
+_executable_bits = stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
+
+_groups = None
+
+
+def is_executable_status(status):
+    """Whether a file with that stat data is one which bash would execute
+
+    This is bash's own rule: root may execute a file if anyone may,
+        others use the owner's, group's, or everyone's bit, as applies
+
+    >>> assert is_executable_status(os.stat('/bin/sh'))
+    >>> assert not is_executable_status(os.stat('/bin'))
+    """
+    global _groups
+    mode = status.st_mode
+    if not stat.S_ISREG(mode):
+        return False
+    user = os.geteuid()
+    if not user:
+        return bool(mode & _executable_bits)
+    if status.st_uid == user:
+        return bool(mode & stat.S_IXUSR)
+    if _groups is None:
+        _groups = {os.getegid(), *os.getgroups()}
+    if status.st_gid in _groups:
+        return bool(mode & stat.S_IXGRP)
+    return bool(mode & stat.S_IXOTH)
+
+
+def directory_commands(path_dir):
+    """A list of names of executable files in that directory
+
+    Uses the stat data which os.scandir() keeps with each entry
+        rather than a separate stat for each file
+    Files are executable by the same rule as is_executable_file()
+    """
+    names = []
+    try:
+        with os.scandir(path_dir) as entries:
+            for entry in entries:
+                try:
+                    if not entry.is_file():
+                        continue
+                    if is_executable_status(entry.stat()):
+                        names.append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        return []
+    return names
+
+
+def scan_directories(path_dirs, workers):
+    """A list of directory_commands() for each of those directories
+
+    With more than one worker, directories are read at the same time
+        which helps most when some are on slow (e.g. network) mounts
+    """
+    if workers < 2 or len(path_dirs) < 2:
+        return [directory_commands(_) for _ in path_dirs]
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(directory_commands, path_dirs))
+
+
+_index_version = 1
+
+# volatile to importers
+workers = 1
+
+
+def path_index(workers_=None):
+    """Names of executables in each directory of PATH, in PATH order
+
+    Names are kept in the cache with each directory's signature,
+        and a directory is only read again if its signature changed
+    Adding or removing a file changes a directory's signature,
+        but changing a file's mode does not
+    """
+    stored = cache.load('path', _index_version)
+    if not isinstance(stored, dict):
+        stored = {}
+    path_dirs = [_ for _ in path_strings() if os.path.isdir(_)]
+    signatures = {_: cache.signature(_) for _ in path_dirs}
+    stale = []
+    for path_dir in path_dirs:
+        entry = stored.get(path_dir)
+        if (cache.valid(entry, signature=list, names=list) and
+                cache.unchanged(entry['signature'], signatures[path_dir])):
+            continue
+        if path_dir not in stale:
+            stale.append(path_dir)
+    scanned = scan_directories(stale, workers_ or workers)
+    for path_dir, names in zip(stale, scanned):
+        stored[path_dir] = {
+            'signature': signatures[path_dir], 'names': names}
+    if stale:
+        cache.save('path', _index_version, stored)
+    return [(_, stored[_]['names']) for _ in path_dirs]
 
 
-def path_commands():
+def path_commands(workers_=None):
     """Gives a dictionary of all executable files in the environment's PATH
 
+    If a name is in more than one directory, the first directory wins
+
     >>> import sys
     >>> path_commands()['python'] == sys.executable or True
     True
     """
     commands = {}
-    for path_dir in paths():
-        if not path_dir.isdir():
-            continue
-        for file_path in path_dir.list_files():
-            if not file_path.isexec():
-                continue
-            if file_path.name in commands:
+    for path_dir, names in path_index(workers_):
+        for name in names:
+            if name in commands:
                 continue
-            commands[file_path.name] = file_path
+            commands[name] = path(os.path.join(path_dir, name))
     return commands
 
 
-_path_commands = path_commands()
+def path_locations(workers_=None):
+    """All executables in PATH for each name, in PATH order
+
+    Gives {name: [path, ...]}, where the first path is the one bash runs
+    A directory given more than once in PATH only counts once
+
+    >>> locations = path_locations()
+    >>> all(_.endswith('/sh') for _ in locations['sh'])
+    True
+    """
+    locations = {}
+    seen = set()
+    for path_dir, names in path_index(workers_):
+        if path_dir in seen:
+            continue
+        seen.add(path_dir)
+        for name in names:
+            path_to_name = os.path.join(path_dir, name)
+            try:
+                locations[name].append(path_to_name)
+            except KeyError:
+                locations[name] = [path_to_name]
+    return locations
+
+
+# volatile to importers
+lazy = True
+
+_path_commands = None
+
+
+def all_path_commands():
+    """The table of path_commands(), built once, when first needed"""
+    global _path_commands
+    if _path_commands is None:
+        _path_commands = path_commands()
+    return _path_commands
+
+
+def is_executable_file(string):
+    """Whether string names an executable file
+
+    Uses is_executable_status(), as does directory_commands()
+
+    >>> assert is_executable_file('/bin/sh')
+    >>> assert not is_executable_file('/bin')
+    """
+    try:
+        return is_executable_status(os.stat(string))
+    except (OSError, ValueError):
+        return False
+
+
+def probe(name):
+    """Look for an executable name in each directory of PATH, in order
+
+    Stops at the first hit, so directories after that are never read
+
+    >>> import sys
+    >>> probe('python') == sys.executable or True
+    True
+    >>> probe('not a real command')
+    ''
+    """
+    path_to_name = first_in_path(name)
+    return path(path_to_name) if path_to_name else ''
+
+
+def first_in_path(name):
+    """The first executable with that name in PATH, as a string, or ''"""
+    if not name or os.sep in name:
+        return ''
+    for path_dir in path_strings():
+        path_to_name = os.path.join(path_dir, name)
+        if is_executable_file(path_to_name):
+            return path_to_name
+    return ''
+
+
+def find(name):
+    """Find the name in PATH, by probing or from the full table"""
+    if lazy:
+        return probe(name)
+    return all_path_commands().get(name, '')
+
+
+def find_string(name):
+    """Find the name in PATH, as a string, without making a path"""
+    if lazy:
+        return first_in_path(name)
+    return str(all_path_commands().get(name, ''))
 
 
 def which(name):
@@ -55,14 +260,13 @@ def which(name):
     >>> which('python') == sys.executable or True
     True
     """
-    try:
-        commands = _path_commands
-        return commands[name]
-    except KeyError:
-        if name.endswith('.exe'):
-            return ''
-        return which('%s.exe' % name)
+    command = find(name)
+    if command:
+        return command
+    if name.endswith('.exe'):
+        return ''
+    return which('%s.exe' % name)
 
 
 def is_path_command(name):
-    return name in _path_commands
+    return bool(find(name))
@@ -5,92 +5,292 @@ bash's `source` builtin will parse out aliases / functions from source files
 
 This module provides a source() method to recognise aliases / functions
     and tag them for later use
+
+Sourced files are remembered in a log, one path per line
+    Sourcing a file appends one line, so the log is never rewritten then
+    The last line for a file says when it was last sourced
+    The log is rewritten (compacted) when it holds many more lines than files
+Compacting holds a lock on the log (see cache.locked()) against other compacts
+    but bash appends without it, as appending one short line is atomic
+    so once the log is replaced, lines appended late to the old one are kept
 """
 
 import os
+import re
 from typing import List
 
+from whyp import cache
 
-import sys
 
-class YamlNotFoundError(ModuleNotFoundError):
-    def __init__(self):
-        command = ' '.join(sys.argv)
-        super().__init__(
-            f'''$ {command}
-            {sys.executable} cannot import yaml
-            ''')
+def path_to_log() -> str:
+    """Where sourced files are remembered, $WHYP_SOURCES if that is set"""
+    return os.environ.get('WHYP_SOURCES') or '%s.log' % (
+        os.path.splitext(__file__)[0])
 
-try:
-    import yaml
-except ModuleNotFoundError:
-    raise YamlNotFoundError()
 
-from pysyte.types import paths
+def _path_to_yaml() -> str:
+    """Where sourced files were remembered by older versions"""
+    return '%s.yaml' % os.path.splitext(path_to_log())[0]
 
-def _path_to_yaml():
-    return paths.path(__file__).extend_by('yaml')
 
+def read_yaml_list(path_to_yaml: str) -> List[str]:
+    """The items of a yaml list of strings, as written by yaml.safe_dump()
 
-# volatile to importers
-optional = False
+    Only plain, or simply quoted, strings are expected
+        so this does not need yaml itself
+    """
+    items = []
+    with open(path_to_yaml) as stream:
+        for line in stream:
+            if not line.startswith('- '):
+                continue
+            item = line[2:].strip()
+            if item[:1] == item[-1:] == "'":
+                item = item[1:-1].replace("''", "'")
+            elif item[:1] == item[-1:] == '"':
+                item = item[1:-1].replace('\\"', '"')
+            items.append(item)
+    return items
 
-def load(optional_: bool) -> List[str]:
-    """Provide the data from a yaml file"""
-    global optional
-    optional = optional_
-    path = _path_to_yaml()
-    if not path.isfile():
-        return list()
+
+def migrate() -> bool:
+    """Move files from an older yaml file to the log, once
+
+    The yaml file is removed once its files are in the log
+    """
+    path_to_yaml = _path_to_yaml()
+    if os.path.isfile(path_to_log()) or not os.path.isfile(path_to_yaml):
+        return False
     try:
-        with open(path) as stream:
-            loaded = set(yaml.safe_load(stream) or [])
-            return sorted(loaded)
-    except FileNotFoundError:
-        if not optional:
-            raise
-    return []
+        files = read_yaml_list(path_to_yaml)
+        with cache.locked(path_to_log()):
+            cache.replace_file(
+                path_to_log(), ''.join('%s\n' % _ for _ in files))
+        os.remove(path_to_yaml)
+    except (OSError, UnicodeDecodeError):
+        return False
+    return True
 
 
-def load_files(path: paths.FilePath) -> List[paths.FilePath]:
-    """Provide the files from a yaml file"""
-    if not path.isfile():
+def _read_lines(stream) -> List[str]:
+    """The (rest of the) lines in that stream, if any"""
+    if not stream:
         return []
-    return [_ for _ in load(path)]
+    return [_.rstrip('\n') for _ in stream if _.strip()]
 
 
-_sources = load_files(_path_to_yaml())
+def _open_log(path_to_file: str):
+    """That log open for reading, or None if there is no log"""
+    try:
+        return open(path_to_file)
+    except FileNotFoundError:
+        return None
 
 
-def save():
-    real_sources = sorted([s for s in _sources if os.path.isfile(s)])
+def read_log(path_to_file: str) -> List[str]:
+    """The lines of that log, which may repeat files"""
+    stream = _open_log(path_to_file)
     try:
-        with open(_path_to_yaml(), 'w') as stream:
-            yaml.safe_dump(real_sources, stream)
+        return _read_lines(stream)
+    finally:
+        if stream:
+            stream.close()
+
+
+def load_files(path_to_file: str) -> List[str]:
+    """The files in that log, in the order first sourced"""
+    return list(dict.fromkeys(read_log(path_to_file)))
+
+
+def last_sourced(lines: List[str]) -> dict:
+    """The files in those lines, in the order each was last sourced
+
+    >>> list(last_sourced(['fred', 'mary', 'fred']))
+    ['mary', 'fred']
+    """
+    return dict.fromkeys(reversed(dict.fromkeys(reversed(lines))))
+
+
+# volatile to importers
+optional = False
+
+# The log is compacted when it has more than this many lines for each file
+compact_ratio = 2
+
+_sources = None
+
+
+def registered() -> dict:
+    """The files remembered as sourced, read from the log when first needed
+
+    Files are kept in the order each was last sourced, newest last
+    Reading a log with too many repeated lines compacts it
+    """
+    global _sources
+    if _sources is None:
+        migrate()
+        lines = read_log(path_to_log())
+        _sources = last_sourced(lines)
+        if len(lines) > compact_ratio * max(len(_sources), 1):
+            save()
+    return _sources
+
+
+def load(optional_: bool) -> List[str]:
+    """The files remembered as sourced"""
+    global optional
+    optional = optional_
+    return sorted(registered())
+
+
+def save() -> bool:
+    """Rewrite the log, keeping only files which still exist
+
+    Files stay in the order each was last sourced
+    The log is read again once locked, to keep lines appended since
+        and the old log is read again once replaced, to keep lines appended
+        by a shell which opened it before it was replaced
+    """
+    global _sources
+    known = list(registered())
+    old = None
+    try:
+        with cache.locked(path_to_log()):
+            old = _open_log(path_to_log())
+            lines = known + _read_lines(old)
+            real_sources = [
+                _ for _ in last_sourced(lines) if os.path.isfile(_)]
+            text = ''.join('%s\n' % _ for _ in real_sources)
+            cache.replace_file(path_to_log(), text)
+            late = _read_lines(old)
+            if late:
+                with open(path_to_log(), 'a') as stream:
+                    stream.write(''.join('%s\n' % _ for _ in late))
+            _sources = last_sourced(real_sources + late)
         return True
-    except:
+    except OSError:
+        _sources = dict.fromkeys(_ for _ in known if os.path.isfile(_))
         return optional
+    finally:
+        if old:
+            old.close()
 
 
-def clear():
+def clear() -> bool:
     global _sources
-    _sources = set()
-    return save() or optional
+    _sources = {}
+    try:
+        with cache.locked(path_to_log()):
+            cache.replace_file(path_to_log(), '')
+        return True
+    except OSError:
+        return optional
+
 
+def source(path_to_file: str) -> bool:
+    """Remember that file as sourced, by appending one line to the log
 
-def source(path_to_file):
-    if os.path.isfile(path_to_file):
-        if path_to_file in _sources:
-            return True
-        _sources.add(path_to_file)
-        save()
+    Nothing is appended if that file was already the last one sourced
+    """
+    if not os.path.isfile(path_to_file):
+        return optional
+    path_to_file = os.path.abspath(path_to_file)
+    if list(registered())[-1:] == [path_to_file]:
         return True
-    return optional
+    _sources.pop(path_to_file, None)
+    _sources[path_to_file] = None
+    try:
+        with cache.locked(path_to_log()):
+            with open(path_to_log(), 'a') as stream:
+                stream.write('%s\n' % path_to_file)
+    except OSError:
+        return optional
+    return True
+
+
+def any() -> bool:
+    return bool(registered()) or optional
+
+
+def all() -> List[str]:
+    return sorted(registered()) or ([] if optional else None)
+
+
+_definitions = re.compile(rb'''^[ \t]*(?:
+    alias[ \t]+(?P<alias>[^\s=]+)=
+  | function[ \t]+(?P<function>[^\s(){}]+)
+  | (?P<name>[^\s(){}=#$'"]+)[ \t]*\(\)
+)''', re.MULTILINE | re.VERBOSE)
+
+
+def definitions(path_to_file: str) -> dict:
+    """Where each alias and function is defined in that file
+
+    Gives {name: [kind, line, offset]}, for the last definition of each name
+        (which is the one bash uses after sourcing the file)
+        where offset is in bytes from the start of the file
+    """
+    try:
+        with open(path_to_file, 'rb') as stream:
+            data = stream.read()
+    except OSError:
+        return {}
+    found = {}
+    line, counted = 1, 0
+    for match in _definitions.finditer(data):
+        kind = 'alias' if match.group('alias') else 'function'
+        name = next(_ for _ in match.groups() if _).decode(errors='replace')
+        offset = match.start()
+        line += data.count(b'\n', counted, offset)
+        counted = offset
+        found[name] = [kind, line, offset]
+    return found
+
+
+_index_version = 1
+
+
+def symbol_index() -> dict:
+    """Definitions in each of the files remembered as sourced
 
+    Gives {path: {name: [kind, line, offset]}}, newest sourced file first
+    The index is kept in whyp's cache, with the signature of each file
+        and a file is only scanned again if its signature changed
+    """
+    stored = cache.load('sources_index', _index_version)
+    if not isinstance(stored, dict):
+        stored = {}
+    index, changed = {}, False
+    for path_to_file in reversed(registered()):
+        signature = cache.signature(path_to_file)
+        entry = stored.get(path_to_file)
+        if (not cache.valid(entry, signature=(list, type(None)), names=dict) or
+                not cache.unchanged(entry['signature'], signature)):
+            entry = {
+                'signature': signature,
+                'names': definitions(path_to_file),
+            }
+            changed = True
+        index[path_to_file] = entry
+    if changed or len(index) != len(stored):
+        cache.save('sources_index', _index_version, index)
+    return {k: v['names'] for k, v in index.items()}
 
-def any():
-    return bool(_sources) or optional
 
+def locate(name: str, kind: str = None) -> List[tuple]:
+    """Where that name is defined in sourced files, as (path, line, offset)
 
-def all():
-    return _sources or ([] if optional else None)
+    Locations are in the files most recently sourced first
+        so the first location is the one which bash would use
+    If kind is given ("alias" or "function"), only those definitions count
+    """
+    locations = []
+    for path_to_file, names in symbol_index().items():
+        try:
+            kind_, line, offset = names[name]
+        except KeyError:
+            continue
+        if kind and kind != kind_:
+            continue
+        locations.append((path_to_file, line, offset))
+    return locations
@@ -3,16 +3,16 @@
 import os
 import re
 import sys
-import stat
-import doctest
+import mmap
+import threading
 import subprocess
-from collections import defaultdict
-from bdb import BdbQuit
-
-from pysyte.iteration import first
-from pysyte.types import paths
+from functools import lru_cache
 
+from whyp import cache
 from whyp import arguments
+from whyp import coprocess
+from whyp import languages
+from whyp import session
 from whyp import shell
 
 
@@ -21,6 +21,7 @@ class BashError(ValueError):
     pass
 
 
+@lru_cache(maxsize=None)
 def pager():
     """Try to use vimcat as a pager, otherwise less
 
@@ -44,11 +45,19 @@ def pager():
 
 
 def replace_alias(command):
-    """Replace any alias with its value at start of the command"""
+    """Replace any aliases at start of the command with their values
+
+    An alias whose value starts with another alias is expanded again
+    """
     if ' ' not in command:
         return command
-    command, args = command.split(' ', 1)
-    return '%s %s' % (find_alias(command), args)
+    word, args = command.split(' ', 1)
+    chain, _ = expand_aliases(word)
+    words = [args]
+    for alias in chain:
+        word, *rest = get_alias(alias).split(' ', 1)
+        words = rest + words
+    return ' '.join([word] + words)
 
 
 def bash_executable():
@@ -56,18 +65,114 @@ def bash_executable():
     return shell.which('bash')
 
 
-def show_output_of_shell_command(command):
-    """Run the given command using bash"""
-
-    def as_str(bytes_):
-        return bytes_.decode(sys.stdin.encoding)
-
-    command = replace_alias(command)
+def run_one_shot(command, source=None):
+    """Run the command in a new bash, giving its status, stdout and stderr"""
+    if source:
+        command = 'shopt -s extglob; . %s; %s' % (source, command)
     bash_command = [bash_executable(), '-c', command]
     process = subprocess.Popen(
         bash_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     stdout, stderr = process.communicate()
-    if not process.returncode:
+    return process.returncode, stdout, stderr
+
+
+def copy_output(fd, stream):
+    """Copy everything from that file descriptor to the stream, as it arrives
+
+    Where the kernel allows, bytes go straight from fd to the stream's own
+        file descriptor with splice(), without being copied into python
+    """
+    stream.flush()
+    try:
+        out = stream.fileno()
+    except (AttributeError, OSError, ValueError):
+        out = None
+    splice = getattr(os, 'splice', None)
+    if splice and out is not None:
+        try:
+            while splice(fd, out, 1 << 20):
+                pass
+            return
+        except BrokenPipeError:
+            raise
+        except OSError:
+            # e.g. EINVAL for a terminal, or an fd opened to append
+            pass
+    buffer = getattr(stream, 'buffer', None)
+    while True:
+        chunk = os.read(fd, 1 << 16)
+        if not chunk:
+            break
+        if buffer:
+            buffer.write(chunk)
+        else:
+            stream.write(chunk.decode(errors='replace'))
+    stream.flush()
+
+
+def stream_one_shot(command, source=None, stderr_limit=1 << 16):
+    """Run the command in a new bash, copying stdout to sys.stdout as it comes
+
+    Gives the status, and the last stderr_limit bytes of stderr
+    """
+    if source:
+        command = 'shopt -s extglob; . %s; %s' % (source, command)
+    process = subprocess.Popen(
+        [bash_executable(), '-c', command],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    tail = bytearray()
+
+    def read_stderr():
+        for chunk in iter(lambda: process.stderr.read1(1 << 12), b''):
+            tail.extend(chunk)
+            del tail[:-stderr_limit]
+
+    reader = threading.Thread(target=read_stderr, daemon=True)
+    reader.start()
+    with process.stdout:
+        copy_output(process.stdout.fileno(), sys.stdout)
+    process.wait()
+    reader.join()
+    process.stderr.close()
+    return process.returncode, bytes(tail)
+
+
+def run_in_bash(command, source=None):
+    """Run the command in bash, after sourcing that file (if any)
+
+    Uses the coprocess for this run, where the file is only sourced once
+        falling back to a new bash if there is no coprocess
+        or if it had stopped before the command could be sent to it
+    """
+    session = coprocess.shared(bash_executable())
+    if session:
+        try:
+            if not source or session.source(source):
+                return session.run(command)
+        except coprocess.CoprocessError:
+            coprocess.close()
+    return run_one_shot(command, source)
+
+
+def show_output_of_shell_command(command, source=None, stream=False):
+    """Run the given command using bash
+
+    If stream is set, output is shown as it arrives, rather than at the end
+    """
+
+    def as_str(bytes_):
+        return bytes_.decode(sys.stdin.encoding or 'utf-8', errors='replace')
+
+    command = replace_alias(command)
+    if stream:
+        returncode, stderr = stream_one_shot(command, source)
+        # stdout was shown already, so it is only named in any error
+        stdout = b'(shown)'
+        if not returncode and (arguments.get('hide_errors') or not stderr):
+            return
+    else:
+        returncode, stdout, stderr = run_in_bash(command, source)
+    if not returncode and not stream:
         # Use sys.stdout.buffer because the output probably includes
         # ANSI colour sequences (making it bytes, not string)
         # https://stackoverflow.com/a/4374457/500942
@@ -84,7 +189,7 @@ def show_output_of_shell_command(command):
         status: %s
         stderr: %s
         stdout: %s''' % (
-            command, process.returncode, as_str(stderr), as_str(stdout)))
+            command, returncode, as_str(stderr), as_str(stdout)))
 
 
 def strip_quotes(string):
@@ -102,28 +207,108 @@ def strip_quotes(string):
     return string
 
 
-def memoize(method):
-    """Cache the return value of the method, which takes no arguments"""
+def file_signature(path_to_file):
+    """Values which change when the file at that path changes
 
-    def call_method(*args, **kwargs):
-        result = method(*args, **kwargs)
-        name = method.__name__
-        item = method, result
-        cache[name].append(item)
-        return result
+    Gives None if there is no such file, see cache.signature()
+    """
+    return cache.signature(path_to_file)
 
-    cache = defaultdict(list)
-    call_method.__doc__ = method.__doc__
-    call_method.__name__ = 'memoized_%s' % method.__name__
-    return call_method
+
+def dump_hash(path_to_file):
+    """The hash which the shell wrote beside that dump, or None
+
+    After each dump the shell writes the output of cksum to "<dump>.hash"
+    A hash is only trusted if it is no older than the dump,
+        and if it gives the dump's size
+    """
+    try:
+        dump = os.stat(path_to_file)
+        path_to_hash = '%s.hash' % path_to_file
+        hashed = os.stat(path_to_hash)
+        with open(path_to_hash) as stream:
+            words = stream.read().split()
+    except (OSError, TypeError, ValueError):
+        return None
+    if hashed.st_mtime_ns < dump.st_mtime_ns:
+        return None
+    if len(words) < 2 or words[1] != str(dump.st_size):
+        return None
+    return words[0]
+
+
+_parsed_version = 2
+
+
+def memoize(option, persist=None):
+    """Cache what the method reads from the file named by that option
+
+    The method takes no arguments, and reads the file named in arguments
+    A cached value is given while that file's signature is unchanged
+
+    If persist is given, then values are also kept in whyp's cache under
+        that name, with the file's dump_hash(), and are used by later runs
+        while the hash is unchanged (such values must be dicts)
+
+    The decorated method counts its hits, misses, and values restored,
+        forgets all cached values on clear(),
+        and forgets values for one file on forget(path_to_file)
+    """
+
+    def decorator(method):
+
+        def restore(hash_):
+            stored = cache.load(persist, _parsed_version)
+            if cache.valid(stored, hash=str, data=dict) and (
+                    stored['hash'] == hash_):
+                call_method.restored += 1
+                return stored['data']
+            result = method()
+            data = {'hash': hash_, 'data': result}
+            cache.save(persist, _parsed_version, data)
+            return result
+
+        def call_method():
+            path_to_file = arguments.get(option)
+            signature = file_signature(path_to_file)
+            try:
+                cached_signature, result = results[path_to_file]
+                if cache.unchanged(cached_signature, signature):
+                    call_method.hits += 1
+                    return result
+            except KeyError:
+                pass
+            call_method.misses += 1
+            hash_ = persist and dump_hash(path_to_file)
+            result = restore(hash_) if hash_ else method()
+            results[path_to_file] = signature, result
+            return result
+
+        def clear():
+            results.clear()
+            call_method.hits = call_method.misses = call_method.restored = 0
+
+        def forget(path_to_file):
+            results.pop(path_to_file, None)
+
+        results = {}
+        call_method.clear = clear
+        call_method.forget = forget
+        call_method.clear()
+        call_method.__doc__ = method.__doc__
+        call_method.__name__ = 'memoized_%s' % method.__name__
+        return call_method
+
+    return decorator
 
 
 def read_command_line():
-    arguments.put('aliases', '/tmp/aliases')
-    arguments.put('functions', '/tmp/functions')
+    arguments.put('aliases', session.path_to('aliases'))
+    arguments.put('functions', session.path_to('functions'))
+    arguments.put('hashed', session.path_to('hashed'))
 
 
-@memoize
+@memoize('aliases', persist='aliases')
 def get_aliases():
     """Read a dictionary of aliases from a file"""
     aliases = arguments.get('aliases')
@@ -151,69 +336,249 @@ def get_alias(string):
     return get_aliases().get(string, None)
 
 
-@memoize
-def get_functions():
-    """Read a dictionary of functions from a known file"""
+_function_bounds = re.compile(rb'^(?:(\S+) \(\) *|\}) *$', re.MULTILINE)
+
+
+@memoize('functions', persist='function_index')
+def get_function_index():
+    """Read a dictionary of where functions are in a known file
+
+    The file holds the output of "declare -f"
+    Each function is given as the (start, end) of its bytes in that file
+        and the number of the line it starts on, all found in one pass
+        bodies are only read by function_source()
+    """
     arg_funcs = arguments.get('functions')
+    if not arg_funcs:
+        return {}
     try:
-        stream = open(arg_funcs) if arg_funcs else []
-        lines = [l.rstrip() for l in stream]
-    except IOError:
+        with open(arg_funcs, 'rb') as stream:
+            dump = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    except (IOError, ValueError):
         return {}
-    name = function_lines = None
-    functions = {}
-    for line in lines:
-        if line == '{':
-            continue
-        elif line == '}':
-            if function_lines:
-                functions[name] = function_lines[:]
-        else:
-            words = line.split()
-            if not words:
-                continue
-            if len(words) == 2 and words[1] == '()':
-                name = words[0]
-                function_lines = []
-                continue
-            function_lines.append(line)
-    result = {}
-    for name, lines in functions.items():
-        result[name] = '%s ()\n{\n%s\n}\n' % (name, '\n'.join(lines))
-    return result
+    index = {}
+    name = start = None
+    line, counted = 1, 0
+    with dump:
+        for match in _function_bounds.finditer(dump):
+            if match.group(1):
+                name, start = match.group(1), match.start()
+                line += dump[counted:start].count(b'\n')
+                counted = start
+            elif name:
+                index[name.decode()] = start, match.end(), line
+                name = None
+    return index
+
+
+def format_function(text):
+    """Tidy the text of a function from "declare -f"
+
+    >>> print(format_function('fred () \\n{ \\n    echo fred\\n\\n}'), end='')
+    fred ()
+    {
+        echo fred
+    }
+    """
+    lines = [_.rstrip() for _ in text.splitlines()]
+    name = lines[0].split()[0]
+    body = [_ for _ in lines[1:-1] if _ and _ != '{']
+    return '%s ()\n{\n%s\n}\n' % (name, '\n'.join(body))
+
+
+def function_source(name):
+    """The source of the named function, or None"""
+    try:
+        start, end, _ = get_function_index()[name]
+    except KeyError:
+        return None
+    with open(arguments.get('functions'), 'rb') as stream:
+        stream.seek(start)
+        text = stream.read(end - start)
+    return format_function(text.decode())
+
+
+def function_location(name):
+    """Where the named function is in the functions file, or None
+
+    Gives the path to that file and the function's line number in it
+    """
+    try:
+        _, _, line = get_function_index()[name]
+    except KeyError:
+        return None
+    return {'file': arguments.get('functions'), 'line': line}
+
+
+@memoize('functions')
+def get_functions():
+    """Read a dictionary of functions from a known file"""
+    return {_: function_source(_) for _ in get_function_index()}
+
+
+def clear_caches():
+    """Forget any aliases or functions read so far"""
+    get_aliases.clear()
+    get_function_index.clear()
+    get_functions.clear()
+    get_hashed.clear()
+
+
+def forget_dump(path_to_file):
+    """Forget any aliases or functions read from that file"""
+    methods = get_aliases, get_function_index, get_functions, get_hashed
+    for method in methods:
+        method.forget(path_to_file)
 
 
 def is_function(name):
-    function = get_functions().get(name, None)
-    return bool(function)
+    return name in get_function_index()
+
+
+# As given by "compgen -k" and "compgen -b" in bash 5
+bash_keywords = frozenset([
+    'if', 'then', 'else', 'elif', 'fi', 'case', 'esac', 'for', 'select',
+    'while', 'until', 'do', 'done', 'in', 'function', 'time', '{', '}', '!',
+    '[[', ']]', 'coproc',
+])
+bash_builtins = frozenset([
+    '.', ':', '[', 'alias', 'bg', 'bind', 'break', 'builtin', 'caller', 'cd',
+    'command', 'compgen', 'complete', 'compopt', 'continue', 'declare',
+    'dirs', 'disown', 'echo', 'enable', 'eval', 'exec', 'exit', 'export',
+    'false', 'fc', 'fg', 'getopts', 'hash', 'help', 'history', 'jobs',
+    'kill', 'let', 'local', 'logout', 'mapfile', 'popd', 'printf', 'pushd',
+    'pwd', 'read', 'readarray', 'readonly', 'return', 'set', 'shift', 'shopt',
+    'source', 'suspend', 'test', 'times', 'trap', 'true', 'type', 'typeset',
+    'ulimit', 'umask', 'unalias', 'unset', 'wait',
+])
+
+
+def is_keyword(name):
+    return name in bash_keywords
+
+
+def is_builtin(name):
+    return name in bash_builtins
+
+
+@memoize('hashed')
+def get_hashed():
+    """Read a dictionary of commands hashed by bash from a known file
+
+    The file holds the output of "hash -l", lines like
+        builtin hash -p /usr/bin/ls ls
+    """
+    hashed = {}
+    try:
+        with open(arguments.get('hashed')) as stream:
+            for line in stream:
+                if not line.startswith('builtin hash -p '):
+                    continue
+                words = line[len('builtin hash -p '):].rstrip('\n')
+                path_to_command, _, name = words.rpartition(' ')
+                hashed[name] = path_to_command
+    except (IOError, TypeError):
+        pass
+    return hashed
+
+
+def command_path(command):
+    """Where bash would find that command: hashed, in $PATH, or as a file"""
+    path_to_command = get_hashed().get(command) or shell.find_string(command)
+    if not path_to_command and os.path.isfile(command):
+        path_to_command = command
+    return path_to_command
+
+
+def kinds(name):
+    """The kinds of everything that name could be, in the order bash looks
+
+    Like "type -at", each of alias, keyword, function, builtin and file
+        which that name is, with no more than one file
+    """
+    found = [kind for kind, is_kind in (
+        ('alias', is_alias),
+        ('keyword', is_keyword),
+        ('function', is_function),
+        ('builtin', is_builtin),
+    ) if is_kind(name)]
+    if command_path(name):
+        found.append('file')
+    return found
+
+
+def kind(name):
+    """What bash would run for that name, like "type -t", or None"""
+    found = kinds(name)
+    return found[0] if found else None
+
+
+class lazy_attribute(object):
+    """A class attribute whose value is made by a method when first read
+
+    The value then replaces the attribute, so the method is called once
+    """
+
+    def __init__(self, method):
+        self.method = method
+
+    def __get__(self, instance, owner):
+        value = self.method()
+        setattr(owner, self.method.__name__, value)
+        return value
 
 
 class Bash(object):
     """This class is a namespace to hold bash commands to be used later"""
     # pylint wants an __init__(), but I don't
     # pylint: disable=no-init
-    view_file = pager()
+
+    @lazy_attribute
+    def view_file():  # or a command, such as pager()
+        from whyp import highlight
+        return highlight.view_file
+
     declare_f = 'declare -f'  # This is a bash builtin
     ls = 'ls'  # This is often in path, and more often aliased
 
 
 def showable(language):
     """A list of languages whose source files we are interested in viewing"""
-    return language in ['python', 'python2', 'python3', 'bash', 'sh']
+    return languages.family(language) in ['python', 'bash', 'sh']
+
+
+def viewer():
+    """The viewer for source, a callable or a shell command
+
+    An external pager is only used if asked for with --pager
+    """
+    if arguments.get('pager'):
+        return pager()
+    return Bash.view_file
+
+
+def highlighted_language(language):
+    """The language that highlight knows for that script language"""
+    return 'python' if language and language.startswith('python') else 'bash'
 
 
 def show_function(command):
     """Show a function to the user"""
     if not arguments.get('verbose'):
         print('%s is a function' % command)
+        return
+    view = viewer()
+    if callable(view):
+        source = function_source(command)
+        if source is not None:
+            view(text='#! /usr/bin/env bash\n%s' % source, language='bash')
     else:
         commands = ' | '.join([
-            "shopt -s extglob; . %s; %s %s" % (
-                arguments.get('functions'), Bash.declare_f, command),
+            '%s %s' % (Bash.declare_f, command),
             "sed '1 i\\\n#! /usr/bin/env bash\n'",
-            Bash.view_file
+            view
         ])
-        show_output_of_shell_command(commands)
+        show_output_of_shell_command(commands, arguments.get('functions'))
 
 
 def shebang_command(path_to_file):
@@ -221,36 +586,23 @@ def shebang_command(path_to_file):
 
     Which is the first line, if that line starts with #!
     """
-    try:
-        first_line = open(path_to_file).readlines()[0]
-        if first_line.startswith('#!'):
-            return first_line[2:].strip()
-    except (IndexError, IOError, UnicodeDecodeError):
-        return ''
+    return languages.shebang(languages.read_prefix(path_to_file))
 
 
 def extension_language(path_to_file):
     """Guess the language used to run a file from its extension"""
-    _, extension = os.path.splitext(path_to_file)
-    known_languages = {'.py': 'python', '.sh': 'bash'}
-    return known_languages.get(extension, None)
+    return languages.extension_language(path_to_file)
 
 
 def shebang_language(path_to_file):
     """Guess the language used to run a file from its shebang line"""
-    run_command = shebang_command(path_to_file)
-    command_words = re.split('[ /]', run_command)
-    try:
-        last_word = command_words[-1]
-    except IndexError:
-        last_word = None
-    return last_word
+    return languages.interpreter(shebang_command(path_to_file))
 
 
 def script_language(path_to_file):
-    """Guess the language used to run a file from its first line
+    """Guess the language used to run a file from its first bytes
 
-    The language should be the last word on the shebang line (if present)
+    Binaries give their kind (e.g. "elf") and scripts their interpreter
     If no shebang line is found, try an extension
 
     >>> script_language('whyp.py') == 'python'
@@ -258,10 +610,13 @@ def script_language(path_to_file):
     >>> script_language('script.sh') == 'bash'
     True
     """
-    for get_language in [shebang_language, extension_language]:
-        language = get_language(path_to_file)
-        if language:
-            return language
+    return languages.language(path_to_file)
+
+
+def show_bash(command):
+    """Show a command which is a bash keyword or builtin"""
+    kind_ = 'keyword' if is_keyword(command) else 'builtin'
+    print('%s is a shell %s' % (command, kind_))
 
 
 def show_command_in_path(command):
@@ -273,7 +628,8 @@ def show_command_in_path(command):
 def show_command_file(path_to_command):
     """Show a command which is a file at that path"""
     if arguments.get('ls'):
-        show_output_of_shell_command('%s -l %r' % (Bash.ls, path_to_command))
+        show_output_of_shell_command(
+            '%s -l %r' % (Bash.ls, str(path_to_command)))
     else:
         p = os.path.realpath(path_to_command)
         if os.path.exists(p):
@@ -281,24 +637,150 @@ def show_command_file(path_to_command):
     if not arguments.get('verbose'):
         return
     language = script_language(path_to_command)
-    if showable(language):
-        show_output_of_shell_command('%s %r' % (
-            Bash.view_file, str(path_to_command)))
+    if not showable(language):
+        return
+    view = viewer()
+    if callable(view):
+        view(str(path_to_command), language=highlighted_language(language))
+    else:
+        show_output_of_shell_command(
+            '%s %r' % (view, str(path_to_command)), stream=True)
 
 
 def show_alias(command):
-    """Show a command defined by alias"""
+    """Show a command defined by alias
+
+    In verbose mode, show each alias it expands to in turn,
+        and then the command which they all stop at
+    """
     alias = get_alias(command)
     print('alias %s=%r' % (command, alias))
     if not arguments.get('verbose'):
         return
-    sub_command = alias.split()[0].strip()
-    if sub_command == command:
-        return
-    if os.path.dirname(sub_command) in shell.paths():
-        show_command(os.path.basename(sub_command))
-    else:
-        show_command(sub_command)
+    chain, sub_command = expand_aliases(command)
+    for name in chain[1:]:
+        print('alias %s=%r' % (name, get_alias(name)))
+    show_command(sub_command, aliased=sub_command not in chain)
+
+
+def alias_command(alias):
+    """The command at the start of an alias
+
+    >>> alias_command('ls -l') == alias_command('/bin/ls') == 'ls'
+    True
+    """
+    words = alias.split()
+    if not words:
+        return ''
+    command = words[0].strip()
+    if os.path.dirname(command) in shell.path_strings():
+        return os.path.basename(command)
+    return command
+
+
+@memoize('aliases')
+def get_alias_chains():
+    """The expansion of every alias, found in one pass over all aliases
+
+    Gives {alias: (chain, command)}, where chain is the aliases expanded
+        in turn (starting with that alias) and command is where they stop
+    Expansion stops at a name which is not an alias (a function, builtin,
+        or executable), or at an alias which was already expanded
+    An alias which expands to another shares that other's chain
+        so each alias is expanded once, however many aliases lead to it
+    """
+    aliases = get_aliases()
+    chains = {}
+    for name in aliases:
+        path, seen = [], {}
+        current = name
+        while current in aliases and current not in chains:
+            if current in seen:
+                break
+            seen[current] = len(path)
+            path.append(current)
+            current = alias_command(aliases[current])
+        if current in seen:
+            start = seen[current]
+            cycle = path[start:]
+            for i, alias in enumerate(cycle):
+                chains[alias] = (tuple(cycle[i:] + cycle[:i]), alias)
+            path = path[:start]
+        tail, command = chains.get(current, ((), current))
+        for alias in reversed(path):
+            tail = (alias,) + tail
+            chains[alias] = (tail, command)
+    return chains
+
+
+def expand_aliases(name):
+    """The names of aliases expanded in turn from name, and the last command
+
+    Expansion stops at a name which is not an alias,
+        or at an alias which was already expanded
+    """
+    chain, command = get_alias_chains().get(name, ((), name))
+    return list(chain), command
+
+
+def resolve(name):
+    """A dictionary describing what bash would run for that name"""
+    chain, command = expand_aliases(name)
+    result = {
+        'name': name,
+        'kind': chain and 'alias' or None,
+        'path': None,
+        'alias_chain': chain,
+        'function': None,
+        'language': None,
+    }
+    if is_keyword(command):
+        result['kind'] = result['kind'] or 'keyword'
+        return result
+    if is_function(command):
+        result['kind'] = result['kind'] or 'function'
+        result['function'] = function_location(command)
+        return result
+    if is_builtin(command):
+        result['kind'] = result['kind'] or 'builtin'
+        return result
+    path_to_command = command_path(command)
+    if path_to_command:
+        result['kind'] = result['kind'] or 'file'
+        result['path'] = os.path.realpath(path_to_command)
+        result['language'] = script_language(path_to_command)
+    return result
+
+
+def definitions(name, locations, aliases, functions):
+    """Each definition of that name, starting with the one bash would use"""
+    found = []
+    if name in aliases:
+        found.append('alias %s=%r' % (name, aliases[name]))
+    if name in functions:
+        found.append('function %s' % name)
+    found.extend(locations.get(name, []))
+    return found
+
+
+def shadows(names=None):
+    """Names with more than one definition, and what those definitions are
+
+    Gives a list of (name, definition used, [definitions shadowed])
+        for those names (or all names, if none are given)
+    Definitions are aliases, functions and all executables in PATH
+    """
+    locations = shell.path_locations()
+    aliases = get_aliases()
+    functions = get_function_index()
+    if not names:
+        names = sorted(set(locations).union(aliases, functions))
+    result = []
+    for name in names:
+        found = definitions(name, locations, aliases, functions)
+        if len(found) > 1:
+            result.append((name, found[0], found[1:]))
+    return result
 
 
 def nearby_file(named_file, extension):
@@ -310,8 +792,11 @@ def nearby_file(named_file, extension):
     return os.path.splitext(named_file)[0] + extension
 
 
-def show_command(command):
-    """Show whatever is behind a command"""
+def show_command(command, aliased=True):
+    """Show whatever is behind a command
+
+    If not aliased then any alias for command is ignored
+    """
     methods = []
     if arguments.get('file'):
         methods = [
@@ -319,8 +804,10 @@ def show_command(command):
         ]
     elif not arguments.get('quiet'):
         methods = [
-            (is_alias, show_alias),
+            (lambda _: aliased and is_alias(_), show_alias),
+            (is_keyword, show_bash),
             (is_function, show_function),
+            (is_builtin, show_bash),
             (shell.is_path_command, show_command_in_path),
             (os.path.isfile, show_command_file),
         ]
@@ -0,0 +1,218 @@
+"""Keep python interpreters running, to answer questions about modules
+
+Asking another python about a module usually means starting that python
+    once for every module, e.g. "python3.7 -c 'import fred'"
+Instead this module starts each python once, as a worker,
+    and then asks it any number of questions over pipes
+
+Workers need nothing but the standard library of their own python
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import subprocess
+
+
+worker_code = r'''
+import sys, json, importlib, contextlib
+import importlib.util as util
+import importlib.machinery as machinery
+
+def find_spec(name):
+    parts = name.split('.')
+    spec = util.find_spec(parts[0])
+    for i in range(1, len(parts)):
+        if not spec or spec.submodule_search_locations is None:
+            return None
+        spec = machinery.PathFinder.find_spec(
+            '.'.join(parts[:i + 1]), spec.submodule_search_locations)
+    return spec
+
+def locate(name):
+    spec = find_spec(name)
+    if not spec:
+        return None
+    if spec.origin == 'frozen':
+        return getattr(spec.loader_state, 'filename', None) or 'frozen'
+    if spec.origin:
+        return spec.origin
+    return list(spec.submodule_search_locations)[0]
+
+def version(name):
+    try:
+        from importlib import metadata
+    except ImportError:
+        return None
+    top_name = name.split('.')[0]
+    try:
+        distributions = metadata.packages_distributions()
+    except AttributeError:
+        distributions = {}
+    for distribution in distributions.get(top_name, [top_name]):
+        try:
+            return metadata.version(distribution)
+        except metadata.PackageNotFoundError:
+            continue
+    return None
+
+def imports(name):
+    # Import afresh each time, as the module's files may have changed since
+    importlib.invalidate_caches()
+    known = set(sys.modules)
+    try:
+        # Anything the module prints must not be taken as an answer
+        with contextlib.redirect_stdout(sys.stderr):
+            module = importlib.import_module(name)
+        return getattr(module, '__file__', None) or 'built-in'
+    finally:
+        for imported in set(sys.modules) - known:
+            del sys.modules[imported]
+
+def executable(_):
+    return sys.executable
+
+questions = dict(
+    locate=locate, version=version, imports=imports, executable=executable)
+
+for line in sys.stdin:
+    question = json.loads(line)
+    try:
+        answer = questions[question['ask']](question.get('name'))
+    except Exception:
+        answer = None
+    sys.stdout.write(json.dumps(answer) + '\n')
+    sys.stdout.flush()
+'''
+
+
+class Worker(object):
+    """One python interpreter, answering questions one line at a time"""
+
+    def __init__(self, executable):
+        self.executable = executable
+        self.process = subprocess.Popen(
+            [executable, '-c', worker_code],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, universal_newlines=True, bufsize=1)
+        self.last_used = time.monotonic()
+
+    def ask(self, question, name=None):
+        """The worker's answer to that question about that name"""
+        self.last_used = time.monotonic()
+        request = json.dumps({'ask': question, 'name': name})
+        self.process.stdin.write(request + '\n')
+        self.process.stdin.flush()
+        answer = self.process.stdout.readline()
+        if not answer:
+            raise EOFError('%s stopped answering' % self.executable)
+        return json.loads(answer)
+
+    def close(self):
+        """Close the pipes, and wait for the process, even if it has failed"""
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def resolve(executable):
+    """The path to that python executable, as found from here, now
+
+    A name is looked for in the current PATH, a relative path from here
+        so workers are never shared by different pythons of the same name
+    """
+    if os.sep in executable:
+        return os.path.abspath(executable)
+    return shutil.which(executable, path=os.environ.get('PATH')) or executable
+
+
+class Pool(object):
+    """Workers for each python executable
+
+    At most max_idle workers are kept, closing the least recently used
+        and workers unused for more than idle_seconds are closed too
+    """
+
+    def __init__(self, max_idle=4, idle_seconds=300):
+        self.max_idle = max_idle
+        self.idle_seconds = idle_seconds
+        self.workers = {}
+        self.started = 0
+
+    def worker(self, executable):
+        """A running worker for that executable"""
+        self.close_idle()
+        worker = self.workers.pop(executable, None)
+        if not worker or worker.process.poll() is not None:
+            worker = Worker(executable)
+            self.started += 1
+        self.workers[executable] = worker
+        while len(self.workers) > self.max_idle:
+            oldest = next(iter(self.workers))
+            self.workers.pop(oldest).close()
+        return worker
+
+    def ask(self, executable, question, name=None):
+        """That executable's answer to that question about that name"""
+        executable = resolve(executable)
+        try:
+            return self.worker(executable).ask(question, name)
+        except (OSError, EOFError, ValueError):
+            worker = self.workers.pop(executable, None)
+            if worker:
+                worker.close()
+            return None
+
+    def close_idle(self):
+        """Close workers which have not been asked anything for a while"""
+        now = time.monotonic()
+        idle = [k for k, v in self.workers.items()
+                if now - v.last_used > self.idle_seconds]
+        for executable in idle:
+            self.workers.pop(executable).close()
+
+    def close(self):
+        while self.workers:
+            _, worker = self.workers.popitem()
+            worker.close()
+
+
+_pool = None
+
+
+def pool():
+    """The pool of workers for this process"""
+    global _pool
+    if not _pool:
+        _pool = Pool()
+        atexit.register(_pool.close)
+    return _pool
+
+
+def ask(executable, question, name=None):
+    """Ask the worker for that executable a question about that name
+
+    Questions are "locate", "version", "imports" or "executable"
+    """
+    return pool().ask(executable or sys.executable, question, name)
+
+
+def ask_all(executables, question, names):
+    """Answers from each executable, for each of those names
+
+    Gives a list of (executable, name, answer)
+        starting each executable once, however many names are asked about
+    """
+    return [(executable, name, ask(executable, question, name))
+            for executable in executables
+            for name in names]